@@ -1,8 +1,7 @@
 # Metadata of a Dataset and Distributions. CKAN Fields https://project-open-data.cio.gov/v1.1/metadata-resources/ // https://github.com/project-open-data/project-open-data.github.io/blob/f136070aa9fea595277f6ebd1cd66f57ff504dfd/v1.1/metadata-resources.md
 
 ## Import libraries   
-import urllib.parse
-import json
+from ckan_datasets.serialization import set_content_hash, dumps_json
 
 
 class Distribution:
@@ -166,10 +165,16 @@ class Dataset:
         self.author_url = None
         self.distributions = []
         self.license = None
+        self.content_hash = None
+        # Date fields filled with the harvest date because the source has none, they are not in the content hash.
+        self.harvest_date_fields = []
 
     def set_name(self, name):
         self.name = name
 
+    def set_harvest_date_fields(self, harvest_date_fields):
+        self.harvest_date_fields = harvest_date_fields
+
     def set_ckan_id(self, ckan_id):
         self.ckan_id = ckan_id
 
@@ -580,7 +585,7 @@ class Dataset:
             dataset_dict = self.dataset_dict_multilang()
         else:
             dataset_dict = self.dataset_dict()
-        # Use the json module to dump the dictionary to a string for posting.
-        quoted_data = urllib.parse.quote(json.dumps(dataset_dict))
-        byte_data = quoted_data.encode('utf-8')
-        return byte_data
\ No newline at end of file
+        # Store the content hash in an extra to detect changes in the next harvest.
+        self.content_hash = set_content_hash(dataset_dict, self.harvest_date_fields)
+        # Compact UTF-8 JSON for posting.
+        return dumps_json(dataset_dict)
\ No newline at end of file
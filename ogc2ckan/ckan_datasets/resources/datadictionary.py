@@ -1,8 +1,7 @@
 # Metadata of a Dataset and Distributions. CKAN Data Dictionary Fields https://docs.ckan.org/en/2.9/maintaining/datastore.html#fields
 
 ## Import libraries   
-import urllib.parse
-import json
+from ckan_datasets.serialization import dumps_json
 
 class DataDictionaryField:
     """
@@ -134,7 +133,5 @@ class DataDictionary:
         Generate data for posting to CKAN.
         """
         dataset_dict = self.dataset_dict()
-        # Use the json module to dump the dictionary to a string for posting.
-        quoted_data = urllib.parse.quote(json.dumps(dataset_dict))
-        byte_data = quoted_data.encode('utf-8')
-        return byte_data
\ No newline at end of file
+        # Compact UTF-8 JSON for posting.
+        return dumps_json(dataset_dict)
\ No newline at end of file
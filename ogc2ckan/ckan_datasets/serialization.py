@@ -0,0 +1,87 @@
+# inbuilt libraries
+import hashlib
+import json
+from typing import List, Optional
+
+# third-party libraries
+# orjson is optional, it is used to encode the request bodies if it is installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# CKAN extra with the content hash of the harvested dataset.
+CONTENT_HASH_KEY = 'harvest_content_hash'
+
+# Dataset fields that change on every harvest without any change in the source (random ids, harvest dates).
+CONTENT_HASH_EXCLUDED_FIELDS = ['id', 'name']
+CONTENT_HASH_EXCLUDED_EXTRAS = ['issued', CONTENT_HASH_KEY]
+CONTENT_HASH_EXCLUDED_RESOURCE_FIELDS = ['id', 'issued']
+
+
+def get_content_hash(dataset_dict: dict, excluded_fields: Optional[List[str]] = None) -> str:
+    """
+    Returns the SHA-256 hash of the canonical JSON of a CKAN dataset dict.
+
+    The fields that change on every harvest (ids, names, issued dates and the dates filled with the
+    harvest date because the source has none) are not hashed, so two harvests of the same source
+    record have the same hash.
+
+    Args:
+        dataset_dict (dict): The dataset dict sent to the CKAN API.
+        excluded_fields (List[str], optional): Other dataset fields not hashed (e.g. 'modified' if it is the harvest date). Defaults to None.
+
+    Returns:
+        str: The hexadecimal SHA-256 hash.
+    """
+    excluded_fields = CONTENT_HASH_EXCLUDED_FIELDS + list(excluded_fields or [])
+    content = {k: v for k, v in dataset_dict.items() if k not in excluded_fields}
+    content['extras'] = [e for e in dataset_dict.get('extras') or [] if e.get('key') not in CONTENT_HASH_EXCLUDED_EXTRAS]
+    content['resources'] = [
+        {k: v for k, v in resource.items() if k not in CONTENT_HASH_EXCLUDED_RESOURCE_FIELDS}
+        for resource in dataset_dict.get('resources') or []
+    ]
+    canonical_json = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+    return hashlib.sha256(canonical_json.encode('utf-8')).hexdigest()
+
+
+def set_content_hash(dataset_dict: dict, excluded_fields: Optional[List[str]] = None) -> str:
+    """
+    Adds the content hash of a CKAN dataset dict to its extras.
+
+    Args:
+        dataset_dict (dict): The dataset dict sent to the CKAN API.
+        excluded_fields (List[str], optional): Other dataset fields not hashed. Defaults to None.
+
+    Returns:
+        str: The content hash added.
+    """
+    content_hash = get_content_hash(dataset_dict, excluded_fields)
+    extras = [e for e in dataset_dict.get('extras') or [] if e.get('key') != CONTENT_HASH_KEY]
+    extras.append({'key': CONTENT_HASH_KEY, 'value': content_hash})
+    dataset_dict['extras'] = extras
+
+    return content_hash
+
+
+def dumps_json(data: dict) -> bytes:
+    """
+    Encodes a dict as compact UTF-8 JSON to be sent as the body of a CKAN API request.
+
+    orjson is used if it is installed, otherwise the json module.
+
+    Args:
+        data (dict): The dict to encode.
+
+    Returns:
+        bytes: The UTF-8 JSON.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # e.g. dict keys that are not strings, the json module supports them.
+            pass
+
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
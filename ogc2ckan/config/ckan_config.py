@@ -13,7 +13,7 @@ import urllib.request
 
 # custom functions
 from config.ogc2ckan_config import get_log_module, load_yaml
-from mappings.default_ogc2ckan_config import OGC2CKAN_CKANINFO_CONFIG, OGC2CKAN_DBDSN_CONFIG, OGC2CKAN_HARVESTER_CONFIG
+from mappings.default_ogc2ckan_config import OGC2CKAN_CKANINFO_CONFIG, OGC2CKAN_DBDSN_CONFIG, OGC2CKAN_HARVESTER_CONFIG, OGC2CKAN_CKAN_INDEX_CONFIG
 
 log_module = get_log_module(os.path.abspath(__file__))
 
@@ -30,9 +30,47 @@ class CKANInfo:
         self.ssl_unverified_mode = True if os.environ.get('SSL_UNVERIFIED_MODE') == 'True' else OGC2CKAN_CKANINFO_CONFIG['ssl_unverified_mode']
         self.metadata_distributions = True if os.environ.get('METADATA_DISTRIBUTIONS') == 'True' else OGC2CKAN_CKANINFO_CONFIG['metadata_distributions']
         self.parallelization = True if os.environ.get('PARALLELIZATION') == 'True' else OGC2CKAN_CKANINFO_CONFIG['parallelization']
+        self.parallelization_workers = int(os.environ.get('PARALLELIZATION_WORKERS') or 0) or OGC2CKAN_CKANINFO_CONFIG['parallelization_workers']
+        self.streaming_mode = True if os.environ.get('STREAMING_MODE') == 'True' else OGC2CKAN_CKANINFO_CONFIG['streaming_mode']
+        self.streaming_queue_size = int(os.environ.get('STREAMING_QUEUE_SIZE') or OGC2CKAN_CKANINFO_CONFIG['streaming_queue_size'])
+        self.publish_workers = int(os.environ.get('CKAN_PUBLISH_WORKERS') or OGC2CKAN_CKANINFO_CONFIG['publish_workers'])
+        self.publish_rate_limit = float(os.environ.get('CKAN_PUBLISH_RATE_LIMIT') or 0) or OGC2CKAN_CKANINFO_CONFIG['publish_rate_limit']
+        self.upsert_mode = True if os.environ.get('CKAN_UPSERT_MODE') == 'True' else OGC2CKAN_CKANINFO_CONFIG['upsert_mode']
+        self.ckan_index_scope = os.environ.get('CKAN_INDEX_SCOPE') or OGC2CKAN_CKANINFO_CONFIG['ckan_index_scope']
+        self.ckan_index_rows = int(os.environ.get('CKAN_INDEX_ROWS') or OGC2CKAN_CKAN_INDEX_CONFIG['rows'])
+        self.ckan_index_workers = int(os.environ.get('CKAN_INDEX_WORKERS') or OGC2CKAN_CKAN_INDEX_CONFIG['workers'])
+        self.ckan_index_persistent = True if os.environ.get('CKAN_INDEX_PERSISTENT') == 'True' else OGC2CKAN_CKAN_INDEX_CONFIG['persistent']
+        self.ckan_index_full_refresh_days = float(os.environ.get('CKAN_INDEX_FULL_REFRESH_DAYS') or OGC2CKAN_CKAN_INDEX_CONFIG['full_refresh_days'])
+        self.skip_unchanged_sources = True if os.environ.get('SKIP_UNCHANGED_SOURCES') == 'True' else OGC2CKAN_CKANINFO_CONFIG['skip_unchanged_sources']
+        self.csw_page_size = int(os.environ.get('CSW_PAGE_SIZE') or OGC2CKAN_HARVESTER_CONFIG['csw_server']['page_size'])
+        self.csw_page_workers = int(os.environ.get('CSW_PAGE_WORKERS') or OGC2CKAN_HARVESTER_CONFIG['csw_server']['page_workers'])
+        self.csw_page_retries = int(os.environ.get('CSW_PAGE_RETRIES') or OGC2CKAN_HARVESTER_CONFIG['csw_server']['page_retries'])
+        self.csw_incremental_mode = True if os.environ.get('CSW_INCREMENTAL_MODE') == 'True' else OGC2CKAN_HARVESTER_CONFIG['csw_server']['incremental_mode']
+        self.csw_full_harvest_days = float(os.environ.get('CSW_FULL_HARVEST_DAYS') or OGC2CKAN_HARVESTER_CONFIG['csw_server']['full_harvest_days'])
+        self.csw_two_phase_mode = True if os.environ.get('CSW_TWO_PHASE_MODE') == 'True' else OGC2CKAN_HARVESTER_CONFIG['csw_server']['two_phase_mode']
+        self.csw_list_page_size = int(os.environ.get('CSW_LIST_PAGE_SIZE') or OGC2CKAN_HARVESTER_CONFIG['csw_server']['list_page_size'])
+        self.csw_records_batch_size = int(os.environ.get('CSW_RECORDS_BATCH_SIZE') or OGC2CKAN_HARVESTER_CONFIG['csw_server']['records_batch_size'])
+        self.ogc_capabilities_timeout = float(os.environ.get('OGC_CAPABILITIES_TIMEOUT') or OGC2CKAN_HARVESTER_CONFIG['ogc_server']['capabilities_timeout'])
+        self.table_read_only_min_size = int(float(os.environ.get('TABLE_READ_ONLY_MIN_SIZE') or OGC2CKAN_HARVESTER_CONFIG['table']['read_only_min_size']) * 1024 * 1024)
+        self.table_chunk_size = int(os.environ.get('TABLE_CHUNK_SIZE') or OGC2CKAN_HARVESTER_CONFIG['table']['chunk_size'])
+        self.xml_incremental_mode = True if os.environ.get('XML_INCREMENTAL_MODE') == 'True' else OGC2CKAN_HARVESTER_CONFIG['xml']['incremental_mode']
+        self.xml_stream_min_size = int(float(os.environ.get('XML_STREAM_MIN_SIZE') or OGC2CKAN_HARVESTER_CONFIG['xml']['stream_min_size']) * 1024 * 1024)
+        self.xml_parse_workers = int(os.environ.get('XML_PARSE_WORKERS') or OGC2CKAN_HARVESTER_CONFIG['xml']['parse_workers'])
+        self.ogc_capabilities_workers = int(os.environ.get('OGC_CAPABILITIES_WORKERS') or OGC2CKAN_HARVESTER_CONFIG['ogc_server']['capabilities_workers'])
         self.dir3_soup = self.get_dir3_soup()
         self.ckan_dataset_schema = os.environ.get('CKAN_DATASET_SCHEMA', OGC2CKAN_CKANINFO_CONFIG['ckan_dataset_schema'])
 
+    def __getstate__(self):
+        # BeautifulSoup trees are deep and slow to pickle, send the raw HTML to the worker processes instead.
+        state = self.__dict__.copy()
+        state['dir3_soup'] = str(self.dir3_soup) if self.dir3_soup is not None else None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.dir3_soup is not None:
+            self.dir3_soup = BeautifulSoup(self.dir3_soup, 'html.parser')
+
     def get_dir3_soup(self):
         """
         Get the BeautifulSoup object for the dir3_info page.
@@ -4,6 +4,8 @@ import logging.handlers
 import os
 from datetime import datetime
 
+LOG_FORMAT = "%(asctime)s %(levelname)s::%(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
 
 # Logging
 def log_file(log_folder):
@@ -27,8 +29,8 @@ def log_file(log_folder):
 
     logging.basicConfig(
                         handlers=[logging.FileHandler(filename=log_folder + "/ogc2ckan-" + datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".log", encoding='utf-8', mode='a+')],
-                        format="%(asctime)s %(levelname)s::%(message)s",
-                        datefmt="%Y-%m-%d %H:%M:%S", 
+                        format=LOG_FORMAT,
+                        datefmt=LOG_DATEFMT,
                         level=logging.INFO
                         )
     
@@ -42,4 +44,44 @@ def log_file(log_folder):
     for log_file in log_files[:-10]:
         os.remove(os.path.join(log_folder, log_file))
 
-    return logger
\ No newline at end of file
+    return logger
+
+def get_log_filename():
+    '''
+    Returns the path of the log file used by the root logger
+
+    Return
+    ----------
+    Log file path or None if the logger has no file handler
+    '''
+    for handler in logging.root.handlers:
+        if isinstance(handler, logging.FileHandler):
+            return handler.baseFilename
+
+    return None
+
+def log_worker_file(log_filename):
+    '''
+    Starts the logger of a worker process appending to the log file of the main process
+    
+    Parameters
+    ----------
+    - log_filename: Log file of the main process
+
+    Return
+    ----------
+    Logger object
+    '''
+    logger = logging.getLogger()
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+
+    if log_filename is not None:
+        logging.basicConfig(
+                            handlers=[logging.FileHandler(filename=log_filename, encoding='utf-8', mode='a+')],
+                            format=LOG_FORMAT,
+                            datefmt=LOG_DATEFMT,
+                            level=logging.INFO
+                            )
+
+    return logger
@@ -0,0 +1,125 @@
+# inbuilt libraries
+import hashlib
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+# custom functions
+from config.ogc2ckan_config import get_log_module
+
+log_module = get_log_module(os.path.abspath(__file__))
+
+
+class CKANIndexStore:
+    """
+    Local SQLite copy of the index of the datasets of a CKAN site, refreshed incrementally between runs.
+
+    Each scope (a CKAN organization, or '' for all the portal) keeps the 'metadata_modified' of its most recently
+    modified dataset, so the next run only retrieves the datasets modified since then.
+
+    Attributes:
+        db_path (str): Path of the SQLite database.
+    """
+    FIELDS = ['id', 'name', 'title', 'inspire_id', 'alternate_identifier', 'harvest_content_hash', 'metadata_modified']
+
+    def __init__(self, folder: str, ckan_site_url: str):
+        os.makedirs(folder, exist_ok=True)
+        site_hash = hashlib.sha1(ckan_site_url.rstrip('/').encode('utf-8')).hexdigest()[:12]
+        self.db_path = os.path.join(folder, f"ckan_index_{site_hash}.sqlite")
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS datasets (scope TEXT NOT NULL, id TEXT NOT NULL, name TEXT, title TEXT, inspire_id TEXT, alternate_identifier TEXT, harvest_content_hash TEXT, metadata_modified TEXT, PRIMARY KEY (scope, id))')
+            connection.execute('CREATE TABLE IF NOT EXISTS sync_state (scope TEXT PRIMARY KEY, last_modified TEXT, last_full_sync TEXT)')
+
+    @contextmanager
+    def _connect(self):
+        # Worker processes (PARALLELIZATION=True) may synchronize the same database.
+        connection = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Commit the transaction, or roll it back if there is an error.
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_sync_state(self, scope: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the synchronization state of a scope.
+
+        Args:
+            scope (str): CKAN organization, or '' for all the portal.
+
+        Returns:
+            Optional[Dict[str, Any]]: 'last_modified' and 'last_full_sync' (datetime), or None if the scope was never synchronized.
+        """
+        with self._connect() as connection:
+            row = connection.execute('SELECT last_modified, last_full_sync FROM sync_state WHERE scope = ?', (scope,)).fetchone()
+        if row is None:
+            return None
+        return {'last_modified': row[0], 'last_full_sync': datetime.fromisoformat(row[1])}
+
+    def needs_full_sync(self, scope: str, full_refresh_days: float) -> bool:
+        """
+        Whether a scope must be downloaded entirely: never synchronized, or last full synchronization older than full_refresh_days.
+
+        Args:
+            scope (str): CKAN organization, or '' for all the portal.
+            full_refresh_days (float): Days between full synchronizations.
+
+        Returns:
+            bool: True if a full synchronization is needed.
+        """
+        sync_state = self.get_sync_state(scope)
+        return sync_state is None or datetime.now() - sync_state['last_full_sync'] > timedelta(days=full_refresh_days)
+
+    def save_datasets(self, scope: str, ckan_datasets: Iterable[Dict[str, Any]], full_sync: bool = False):
+        """
+        Saves the datasets retrieved from CKAN and updates the synchronization state of the scope.
+
+        Args:
+            scope (str): CKAN organization, or '' for all the portal.
+            ckan_datasets (Iterable[Dict[str, Any]]): The CKAN datasets (package_search results).
+            full_sync (bool, optional): Whether the datasets are all the datasets of the scope, so the rest are deleted. Defaults to False.
+        """
+        rows = [tuple([scope] + [d.get(field) for field in self.FIELDS]) for d in ckan_datasets]
+        last_modified = max((row[-1] for row in rows if row[-1]), default=None)
+
+        with self._connect() as connection:
+            sync_state = connection.execute('SELECT last_modified, last_full_sync FROM sync_state WHERE scope = ?', (scope,)).fetchone()
+            if full_sync:
+                connection.execute('DELETE FROM datasets WHERE scope = ?', (scope,))
+            connection.executemany(f"INSERT OR REPLACE INTO datasets (scope, {', '.join(self.FIELDS)}) VALUES ({', '.join('?' * (len(self.FIELDS) + 1))})", rows)
+
+            if not full_sync and sync_state is not None:
+                last_modified = max(filter(None, [last_modified, sync_state[0]]), default=None)
+            last_full_sync = datetime.now().isoformat() if full_sync or sync_state is None else sync_state[1]
+            connection.execute('INSERT OR REPLACE INTO sync_state (scope, last_modified, last_full_sync) VALUES (?, ?, ?)', (scope, last_modified, last_full_sync))
+
+    def get_datasets(self, scope: str) -> List[Dict[str, Any]]:
+        """
+        Returns the datasets of a scope.
+
+        Args:
+            scope (str): CKAN organization, or '' for all the portal.
+
+        Returns:
+            List[Dict[str, Any]]: The CKAN datasets with the fields of CKANIndexStore.FIELDS.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(f"SELECT {', '.join(self.FIELDS)} FROM datasets WHERE scope = ?", (scope,)).fetchall()
+        return [dict(zip(self.FIELDS, row)) for row in rows]
+
+    def count_datasets(self, scope: str) -> int:
+        """
+        Returns the number of datasets of a scope.
+
+        Args:
+            scope (str): CKAN organization, or '' for all the portal.
+
+        Returns:
+            int: The number of datasets.
+        """
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM datasets WHERE scope = ?', (scope,)).fetchone()[0]
@@ -5,29 +5,68 @@ import logging
 import ssl
 import socket
 import os
-from typing import Any, Dict, Optional, Tuple, Union, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple, Union, List
 
 # third-party libraries  
-import urllib.request
+import urllib.error
+import urllib.parse
 from pprint import pprint, pformat
 
 # custom functions
 from config.ogc2ckan_config import get_log_module
-from mappings.default_ogc2ckan_config import OGC2CKAN_CKAN_API_ROUTES
+from controller.http_transport import get_http_transport
+from controller.pipeline import iter_concurrent
+from controller.ckan_index_store import CKANIndexStore
+from mappings.default_ogc2ckan_config import OGC2CKAN_CKAN_API_ROUTES, OGC2CKAN_CKAN_INDEX_CONFIG, OGC2CKAN_PATHS_CONFIG
+from ckan_datasets.serialization import CONTENT_HASH_KEY
 SSL_UNVERIFIED_MODE = os.environ.get("SSL_UNVERIFIED_MODE", False)
 
 log_module = get_log_module(os.path.abspath(__file__))
 
+# Fields of the CKAN datasets in the index.
+CKAN_INDEX_FIELDS = f"id,name,title,metadata_modified,extras_inspire_id,extras_alternate_identifier,extras_{CONTENT_HASH_KEY}"
+
+# Indexes of the CKAN datasets shared by all the harvest servers of a run. {(ckan_site_url, organization): CKANDatasetIndex}
+_ckan_datasets_index_cache = {}
+_ckan_datasets_index_lock = threading.Lock()
+
+
+class CKANDatasetIndex(dict):
+    """
+    Datasets of CKAN indexed by 'id' and 'inspire_id'. The datasets created during the harvest are added,
+    so the next harvest servers of the run find them without querying CKAN again.
+    """
+    def __init__(self, ckan_datasets: Iterable[Dict[str, Any]] = ()):
+        super().__init__()
+        self._lock = threading.Lock()
+        for ckan_dataset in ckan_datasets:
+            self.add(ckan_dataset)
+
+    def add(self, ckan_dataset: Dict[str, Any]):
+        """
+        Adds or replaces a CKAN dataset in the index.
+
+        Args:
+            ckan_dataset (Dict[str, Any]): The CKAN dataset, at least with its 'id'.
+        """
+        with self._lock:
+            self[ckan_dataset.get('id')] = ckan_dataset
+            if ckan_dataset.get('inspire_id'):
+                self[ckan_dataset['inspire_id']] = ckan_dataset
+
 
 # CKAN Requests
 def make_request(url: str, ssl_unverified_mode: bool, data: bytes = None, authorization_key: Optional[str] = None, return_result: bool = False) -> Union[Dict[str, Any], Any]:
     """ Sends an HTTPS request to the specified URL with the given data and SSL verification mode.
 
+    The request uses the shared keep-alive connection pools of controller.http_transport, with retries on connection errors.
 
     Args:
         url (str): The URL to send the request to.
         ssl_unverified_mode (bool): Whether to use SSL verification or not.
-        data (bytes): The data to send with the request.
+        data (bytes): The JSON data to send with the request.
         authorization_key (str, optional): The authorization key to use for the request. Defaults to None.
         return_result (bool): Whether to return the 'result' object from the CKAN response. Defaults to False.
 
@@ -35,39 +74,22 @@ def make_request(url: str, ssl_unverified_mode: bool, data: bytes = None, author
         Dict[str, Any]: The response from the CKAN server as a dictionary.
         Any: The 'result' object from the CKAN response if return_result is True.
     """
-    try:
-        request = urllib.request.Request(url)
-        # Creating a dataset requires an authorization header.
-        # Replace *** with your API key, from your user account on the CKAN site
-        # that you're creating the dataset on.
-        if authorization_key is not None:
-            request.add_header('Authorization', authorization_key)
-
-        # Try making the HTTPS request using the default SSL context with verification.
-        response = urllib.request.urlopen(request, data)
-        
-    except ssl.CertificateError:
-        if ssl_unverified_mode == True or ssl_unverified_mode == "True":
-            # If the default SSL verification fails, try downloading and loading the certificate.
-            hostname = urllib.parse.urlparse(url).hostname
-            port = 443  # Assuming HTTPS (default port)
-
-            # Download the server's certificate in PEM format.
-            pem_cert = ssl.get_server_certificate((hostname, port))
-
-            # Create an SSL context and load the downloaded certificate without verification.
-            ssl_context = ssl.create_default_context(cadata=pem_cert)
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            # Make the HTTPS request using the custom SSL context.
-            response = urllib.request.urlopen(request, data, context=ssl_context)
-        else:
-            raise ssl.CertificateError(f"{log_module}:[INSECURE] Put SSL_UNVERIFIED_MODE=True if the host certificate is self-signed or invalid.")    
-        
-    assert response.code == 200
+    headers = {}
+    # Creating a dataset requires an authorization header.
+    # Replace *** with your API key, from your user account on the CKAN site
+    # that you're creating the dataset on.
+    if authorization_key is not None:
+        headers['Authorization'] = authorization_key
+    if data is not None:
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+
+    # Reuse the pooled keep-alive connections to the CKAN host.
+    response = get_http_transport().request('POST' if data is not None else 'GET', url, body=data, headers=headers, ssl_unverified_mode=ssl_unverified_mode)
+
+    if response.status != 200:
+        raise urllib.error.HTTPError(url, response.status, f"{response.reason}: {response.data.decode('utf-8', errors='replace')}", response.headers, None)
     # Use the json module to load CKAN's response into a dictionary.
-    response_dict = json.loads(response.read())
+    response_dict = json.loads(response.data)
     assert response_dict['success'] is True
     # package_create / package_update returns the created package as its result.
     package = response_dict['result']
@@ -78,44 +100,90 @@ def make_request(url: str, ssl_unverified_mode: bool, data: bytes = None, author
     else:
         return None
 
-def create_ckan_datasets(ckan_site_url: str, authorization_key: str, datasets: object, dataset_multilang: bool, ssl_unverified_mode: bool = False, workspaces: Optional[str] = None) -> Tuple[int, int]:
+def create_ckan_datasets(ckan_site_url: str, authorization_key: str, datasets: Iterable[object], dataset_multilang: bool, ssl_unverified_mode: bool = False, workspaces: Optional[list] = None, publish_workers: int = 1, publish_rate_limit: Optional[float] = None, upsert_mode: bool = False, organization: Optional[str] = None, index_rows: Optional[int] = None, index_workers: Optional[int] = None, index_persistent: bool = False, index_full_refresh_days: Optional[float] = None) -> Tuple[int, int, list, int, int]:
     """
     Create new datasets on a CKAN server.
 
+    If upsert_mode is True, the datasets that already exist in CKAN are updated only if their content hash
+    has changed since the last harvest, otherwise they are skipped and counted as conflicts.
+
     Args:
         ckan_site_url (str): The URL of the CKAN server.
         authorization_key (str): The API key for the CKAN server.
-        datasets (object): The datasets to create.
+        datasets (Iterable[object]): The datasets to create. It can be a list or a generator that yields the datasets while they are harvested.
         dataset_multilang (bool): Whether the dataset is multilingual or not.
         ssl_unverified_mode (bool, optional): Whether to use SSL verification or not. Defaults to False.
-        workspaces (str, optional): Only those identifiers starting with identifier_filter (e.g. 'open_data:...') are created. Defaults to None.
+        workspaces (list, optional): Only the datasets of these OGC workspaces (e.g. 'open_data:...') are created. Defaults to None.
+        publish_workers (int, optional): Maximum number of package_create requests in flight. Defaults to 1.
+        publish_rate_limit (float, optional): Maximum number of package_create requests per second. Defaults to None (no limit).
+        upsert_mode (bool, optional): Whether to update the datasets that already exist in CKAN. Defaults to False.
+        organization (str, optional): Only check the existing datasets of this CKAN organization. Defaults to None (all the portal).
+        index_rows (int, optional): The number of datasets per page of the CKAN index. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+        index_workers (int, optional): The number of pages of the CKAN index retrieved concurrently. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+        index_persistent (bool, optional): Whether to keep the CKAN index in a local SQLite database between runs. Defaults to False.
+        index_full_refresh_days (float, optional): Days between full synchronizations of the local CKAN index. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
 
     Returns:
-        Tuple[int, int]: A tuple containing the number of Harvester server records and CKAN new records counters.
+        Tuple[int, int, list, int, int]: The CKAN new records, Harvester server records, errors, CKAN updated records and CKAN unchanged records.
     """
     ckan_dataset_errors = []
     ckan_dataset_count = 0
-
-    # Check if the datasets already exists in CKAN.
-    datasets, ckan_dataset_errors, source_dataset_count = check_ckan_datasets_exists(ckan_site_url, authorization_key, datasets, ssl_unverified_mode, ckan_dataset_errors)
-
-    for dataset in datasets:
-        try:
-            if workspaces is not None and not any(x.lower() in dataset.ogc_workspace.lower() for x in workspaces):
-                break
-            data = dataset.generate_data(dataset_multilang)
-            if data is not None:
-                create_ckan_dataset(ckan_site_url, ssl_unverified_mode, data, authorization_key)
-                ckan_dataset_count += 1
-
-        except Exception as e:
-            print(f"\nckan_site_url: {ckan_site_url}\nERROR: {e}\nWhile trying to create: {dataset.name} | {dataset.title}\n{pformat(dataset.dataset_dict())}\n", file=sys.stderr)
-            error_dict = {'title': dataset.title, 'error': str(e)}
-            if hasattr(dataset, 'inspire_id') and dataset.inspire_id:
-                error_dict['inspire_id'] = dataset.inspire_id
-            ckan_dataset_errors.append(error_dict)
-
-    return ckan_dataset_count, source_dataset_count, ckan_dataset_errors
+    source_dataset_count = 0
+    ckan_dataset_updated_count = 0
+    ckan_dataset_unchanged_count = 0
+
+    # Index of the datasets that already exists in CKAN.
+    ckan_dataset_dict = get_ckan_datasets_index(ckan_site_url, authorization_key, ssl_unverified_mode, organization, index_rows, index_workers, index_persistent, index_full_refresh_days)
+
+    def get_datasets_to_create():
+        nonlocal source_dataset_count
+        for dataset in datasets:
+            # Only the datasets of the selected OGC workspaces.
+            if workspaces is not None and not any(x.lower() in (dataset.ogc_workspace or '').lower() for x in workspaces):
+                continue
+
+            # Check if the dataset already exists in CKAN.
+            ckan_dataset = get_ckan_dataset(dataset, ckan_dataset_dict)
+            if ckan_dataset is not None and not upsert_mode:
+                ckan_dataset_errors.append(check_ckan_dataset_exists(dataset, ckan_dataset_dict))
+                continue
+
+            source_dataset_count += 1
+            yield dataset, ckan_dataset
+
+    def publish_dataset(item):
+        dataset, ckan_dataset = item
+        if ckan_dataset is not None:
+            # Keep the id and name of the dataset already in CKAN.
+            dataset.set_ckan_id(ckan_dataset['id'])
+            dataset.set_name(ckan_dataset.get('name') or dataset.name)
+        data = dataset.generate_data(dataset_multilang)
+        if data is None:
+            return None
+        if ckan_dataset is None:
+            create_ckan_dataset(ckan_site_url, ssl_unverified_mode, data, authorization_key)
+            return 'created'
+        if ckan_dataset.get(CONTENT_HASH_KEY) == dataset.content_hash:
+            return 'unchanged'
+        update_ckan_dataset(ckan_site_url, ssl_unverified_mode, data, authorization_key)
+        return 'updated'
+
+    # The requests run in worker threads, the counters and errors are only updated here.
+    for (dataset, ckan_dataset), status, e in iter_concurrent(publish_dataset, get_datasets_to_create(), publish_workers, publish_rate_limit, name='ckan-publisher'):
+        if e is None:
+            if status in ('created', 'updated'):
+                ckan_dataset_dict.add({'id': dataset.ckan_id, 'name': dataset.name, 'title': dataset.title, 'inspire_id': dataset.inspire_id, CONTENT_HASH_KEY: dataset.content_hash})
+            ckan_dataset_count += 1 if status == 'created' else 0
+            ckan_dataset_updated_count += 1 if status == 'updated' else 0
+            ckan_dataset_unchanged_count += 1 if status == 'unchanged' else 0
+            continue
+        print(f"\nckan_site_url: {ckan_site_url}\nERROR: {e}\nWhile trying to {'update' if ckan_dataset else 'create'}: {dataset.name} | {dataset.title}\n{pformat(dataset.dataset_dict())}\n", file=sys.stderr)
+        error_dict = {'title': dataset.title, 'error': str(e)}
+        if hasattr(dataset, 'inspire_id') and dataset.inspire_id:
+            error_dict['inspire_id'] = dataset.inspire_id
+        ckan_dataset_errors.append(error_dict)
+
+    return ckan_dataset_count, source_dataset_count, ckan_dataset_errors, ckan_dataset_updated_count, ckan_dataset_unchanged_count
 
 def ingest_ckan_datasets(ckan_site_url, authorization_key, datasets, ssl_unverified_mode = False, workspace = None):
     #TODO: Fix function.
@@ -219,22 +287,26 @@ def create_ckan_dataset(ckan_site_url: str, ssl_unverified_mode: bool, data: dic
     url = ckan_site_url + OGC2CKAN_CKAN_API_ROUTES['create_ckan_dataset']
     make_request(url, ssl_unverified_mode, data, authorization_key)
 
-def update_ckan_dataset(ckan_site_url, ssl_unverified_mode, data, authorization_key):
-    #TODO: Fix function.
+def update_ckan_dataset(ckan_site_url: str, ssl_unverified_mode: bool, data: dict, authorization_key: str) -> None:
     """
-    '''
-    Update a dataset using CKAN API
+    Update a dataset using CKAN API. The dataset is replaced by the data, so it must contain the 'id' or 'name' of the existing dataset.
 
     Args:
-        ckan_site_url (str): The CKAN server URL.
-        ssl_unverified_mode (bool): Indicates whether SSL mode should be verified.
+        ckan_site_url (str): The URL of the CKAN server.
+        ssl_unverified_mode (bool): Whether to use SSL verification or not.
         data (dict): The data to be sent with the request.
         authorization_key (str): The API authorization key.
-    '''
+
+    Returns:
+        None
+
+    Additional Information:
+        CKAN API Reference:
+        https://docs.ckan.org/en/2.9/api/index.html#ckan.logic.action.update.package_update
+    """
     # We'll use the package_update function to update a dataset.
     url = ckan_site_url + OGC2CKAN_CKAN_API_ROUTES['update_ckan_dataset']
     make_request(url, ssl_unverified_mode, data, authorization_key)
-    """
 
 def ingest_ckan_dataset(ckan_site_url, ssl_unverified_mode, data, authorization_key):
     #TODO: Fix function.
@@ -328,6 +400,75 @@ def get_ckan_datasets_list(ckan_site_url: str, ssl_unverified_mode: bool, author
 
     return results
     
+def search_ckan_datasets(ckan_site_url: str, ssl_unverified_mode: bool, authorization_key: Optional[str] = None, **params) -> Dict[str, Any]:
+    """
+    Search datasets in CKAN with the package_search API.
+
+    Args:
+        ckan_site_url (str): The URL of the CKAN server.
+        ssl_unverified_mode (bool): Whether to use SSL verification or not.
+        authorization_key (str, optional): The API authorization key. Defaults to None.
+        **params: The package_search parameters (q, fq, fl, sort, rows, start, include_private...).
+
+    Returns:
+        Dict[str, Any]: The package_search result ('count' and 'results').
+    """
+    url = ckan_site_url + OGC2CKAN_CKAN_API_ROUTES['search_ckan_datasets'] + '?' + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+    response = make_request(url=url, ssl_unverified_mode=ssl_unverified_mode, authorization_key=authorization_key, return_result=True)
+
+    return response['result']
+
+def get_ckan_datasets_list_by_id(ckan_site_url: str, ssl_unverified_mode: bool, authorization_key: Optional[str] = None, fields: str = 'id,title,extras_inspire_id,extras_alternate_identifier', fq: Optional[str] = None, rows: Optional[int] = None, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Get a list of datasets from CKAN using keyset pagination sorted by 'id'.
+
+    Instead of paginating with an increasing 'start' offset (deep Solr pagination), each page continues after the
+    last 'id' of the previous one. The 'id' space is split in ranges by their first character, which are retrieved concurrently.
+
+    Args:
+        ckan_site_url (str): The URL of the CKAN server.
+        ssl_unverified_mode (bool): Whether to use SSL verification or not.
+        authorization_key (str, optional): The API authorization key. Defaults to None.
+        fields (str, optional): The fields to be returned in the dataset list. Defaults to 'id,title,extras_inspire_id,extras_alternate_identifier'.
+        fq (str, optional): Solr filter query of the datasets (e.g. 'organization:"org"'). Defaults to None.
+        rows (int, optional): The number of datasets per page. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+        workers (int, optional): The number of pages retrieved concurrently. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+
+    Returns:
+        List[Dict[str, Any]]: A list of dictionaries representing the datasets.
+    """
+    rows = rows or OGC2CKAN_CKAN_INDEX_CONFIG['rows']
+    workers = workers or OGC2CKAN_CKAN_INDEX_CONFIG['workers']
+
+    def get_id_range(lower: Optional[str], upper: Optional[str]) -> List[Dict[str, Any]]:
+        results = []
+        last_id = None
+        while True:
+            # Lower bound: after the last id of the previous page, or the start of the range.
+            if last_id is not None:
+                id_range = f'id:{{"{last_id}" TO '
+            else:
+                id_range = f'id:["{lower}" TO ' if lower else 'id:[* TO '
+            id_range += f'"{upper}"}}' if upper else '*]'
+            page = search_ckan_datasets(ckan_site_url, ssl_unverified_mode, authorization_key, q='*:*', fq=f'({fq}) AND {id_range}' if fq else id_range, fl=fields, sort='id asc', rows=rows, include_private=True)['results']
+            results += page
+            if len(page) < rows:
+                return results
+            last_id = page[-1]['id']
+
+    count = search_ckan_datasets(ckan_site_url, ssl_unverified_mode, authorization_key, q='*:*', fq=fq, rows=0, include_private=True)['count']
+    if count <= rows:
+        return get_id_range(None, None)
+
+    boundaries = OGC2CKAN_CKAN_INDEX_CONFIG['id_boundaries']
+    id_ranges = list(zip([None] + boundaries, boundaries + [None]))
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='ckan-index') as executor:
+        results = []
+        for id_range_results in executor.map(lambda id_range: get_id_range(*id_range), id_ranges):
+            results += id_range_results
+
+    return results
+
 def get_ckan_dataset_info(ckan_site_url: str, ssl_unverified_mode: bool, authorization_key: Optional[str] = None, field: str = 'id', field_value: Optional[str] = None) -> None:
     """
     Get information about a dataset from CKAN based on a field and its value.
@@ -344,7 +485,143 @@ def get_ckan_dataset_info(ckan_site_url: str, ssl_unverified_mode: bool, authori
     """
     # We'll use the package_search function to list all datasets with fields as need.
     url = ckan_site_url + OGC2CKAN_CKAN_API_ROUTES['get_ckan_dataset_info'].format(field=field, field_value=field_value)
-    make_request(url, ssl_unverified_mode, authorization_key)
+    make_request(url, ssl_unverified_mode, authorization_key=authorization_key)
+
+def get_ckan_datasets_index(ckan_site_url: str, authorization_key: str, ssl_unverified_mode: bool = False, organization: Optional[str] = None, index_rows: Optional[int] = None, index_workers: Optional[int] = None, index_persistent: bool = False, index_full_refresh_days: Optional[float] = None) -> CKANDatasetIndex:
+    """Get the datasets of CKAN indexed by 'id' and 'inspire_id' for efficient searching.
+
+    The index is retrieved once per run and CKAN organization, and shared by all the harvest servers.
+    An index of the whole portal is also used for the organizations. If index_persistent is True, the index
+    is kept in a local SQLite database and only the datasets modified since the previous run are retrieved.
+
+    Args:
+        ckan_site_url (str): The URL of the CKAN site.
+        authorization_key (str): The authorization key for the CKAN site.
+        ssl_unverified_mode (bool, optional): Whether to use SSL unverified mode. Defaults to False.
+        organization (str, optional): Only index the datasets of this CKAN organization (name or id). Defaults to None (all the portal).
+        index_rows (int, optional): The number of datasets per page. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+        index_workers (int, optional): The number of pages retrieved concurrently. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+        index_persistent (bool, optional): Whether to keep the index in a local SQLite database between runs. Defaults to False.
+        index_full_refresh_days (float, optional): Days between full synchronizations of the local index. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+
+    Returns:
+        CKANDatasetIndex: The CKAN datasets indexed by 'id' and 'inspire_id'.
+    """
+    with _ckan_datasets_index_lock:
+        # An empty index is a valid cached index, the portal index is only used if the organization was not indexed.
+        ckan_dataset_dict = _ckan_datasets_index_cache.get((ckan_site_url, organization))
+        if ckan_dataset_dict is None and organization is not None:
+            ckan_dataset_dict = _ckan_datasets_index_cache.get((ckan_site_url, None))
+        if ckan_dataset_dict is None:
+            fq = f'organization:"{organization}" OR owner_org:"{organization}"' if organization else None
+            if index_persistent:
+                ckan_dataset_list = sync_ckan_datasets_index_store(ckan_site_url, authorization_key, ssl_unverified_mode, organization, fq, index_rows, index_workers, index_full_refresh_days)
+            else:
+                ckan_dataset_list = get_ckan_datasets_list_by_id(ckan_site_url, ssl_unverified_mode, authorization_key, fields=CKAN_INDEX_FIELDS, fq=fq, rows=index_rows, workers=index_workers)
+            ckan_dataset_dict = CKANDatasetIndex(ckan_dataset_list)
+            _ckan_datasets_index_cache[(ckan_site_url, organization)] = ckan_dataset_dict
+            logging.info(f"{log_module}:CKAN datasets indexed{f' of organization: {organization}' if organization else ''}: {len(ckan_dataset_list)}")
+
+    return ckan_dataset_dict
+
+def sync_ckan_datasets_index_store(ckan_site_url: str, authorization_key: str, ssl_unverified_mode: bool = False, organization: Optional[str] = None, fq: Optional[str] = None, index_rows: Optional[int] = None, index_workers: Optional[int] = None, index_full_refresh_days: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Synchronize the local SQLite index of the CKAN datasets and return its datasets.
+
+    Only the datasets with a 'metadata_modified' later than the last synchronization are retrieved. All the datasets are
+    retrieved the first time, every index_full_refresh_days days, and if the number of datasets of the local index
+    does not match CKAN (e.g. deleted datasets).
+
+    Args:
+        ckan_site_url (str): The URL of the CKAN site.
+        authorization_key (str): The authorization key for the CKAN site.
+        ssl_unverified_mode (bool, optional): Whether to use SSL unverified mode. Defaults to False.
+        organization (str, optional): Only index the datasets of this CKAN organization. Defaults to None (all the portal).
+        fq (str, optional): Solr filter query of the datasets of the organization. Defaults to None.
+        index_rows (int, optional): The number of datasets per page. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+        index_workers (int, optional): The number of pages retrieved concurrently. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+        index_full_refresh_days (float, optional): Days between full synchronizations. Defaults to None (OGC2CKAN_CKAN_INDEX_CONFIG).
+
+    Returns:
+        List[Dict[str, Any]]: The CKAN datasets of the local index.
+    """
+    # Imported here, ogc2ckan imports this module.
+    from ogc2ckan import APP_DIR
+
+    store = CKANIndexStore(f"{APP_DIR}/{OGC2CKAN_PATHS_CONFIG['default_state_folder']}", ckan_site_url)
+    scope = organization or ''
+    full_refresh_days = OGC2CKAN_CKAN_INDEX_CONFIG['full_refresh_days'] if index_full_refresh_days is None else index_full_refresh_days
+
+    if store.needs_full_sync(scope, full_refresh_days):
+        store.save_datasets(scope, get_ckan_datasets_list_by_id(ckan_site_url, ssl_unverified_mode, authorization_key, fields=CKAN_INDEX_FIELDS, fq=fq, rows=index_rows, workers=index_workers), full_sync=True)
+        return store.get_datasets(scope)
+
+    last_modified = store.get_sync_state(scope)['last_modified']
+    delta_fq = fq
+    if last_modified:
+        # Solr dates in UTC with second precision, the datasets modified in the same second are retrieved again.
+        modified_fq = f"metadata_modified:[{last_modified[:19]}Z TO *]"
+        delta_fq = f"({fq}) AND {modified_fq}" if fq else modified_fq
+    ckan_dataset_delta = get_ckan_datasets_list_by_id(ckan_site_url, ssl_unverified_mode, authorization_key, fields=CKAN_INDEX_FIELDS, fq=delta_fq, rows=index_rows, workers=index_workers)
+    store.save_datasets(scope, ckan_dataset_delta)
+
+    # Deleted datasets are not retrieved by the deltas.
+    ckan_dataset_count = search_ckan_datasets(ckan_site_url, ssl_unverified_mode, authorization_key, q='*:*', fq=fq, rows=0, include_private=True)['count']
+    if ckan_dataset_count != store.count_datasets(scope):
+        logging.info(f"{log_module}:Local CKAN index ({store.count_datasets(scope)}) is out of sync with CKAN ({ckan_dataset_count}). Retrieving all the datasets.")
+        store.save_datasets(scope, get_ckan_datasets_list_by_id(ckan_site_url, ssl_unverified_mode, authorization_key, fields=CKAN_INDEX_FIELDS, fq=fq, rows=index_rows, workers=index_workers), full_sync=True)
+    else:
+        logging.info(f"{log_module}:Local CKAN index updated with the datasets modified since {last_modified}: {len(ckan_dataset_delta)}")
+
+    return store.get_datasets(scope)
+
+def get_ckan_dataset(dataset: object, ckan_dataset_dict: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Get the CKAN dataset with the same 'id' or 'inspire_id' as a harvested dataset.
+
+    Args:
+        dataset (object): The harvested dataset.
+        ckan_dataset_dict (Dict[str, Dict[str, Any]]): The CKAN datasets indexed by 'id' and 'inspire_id'.
+
+    Returns:
+        Optional[Dict[str, Any]]: The CKAN dataset ('id', 'name', 'title', 'inspire_id' and content hash), or None if it does not exist.
+    """
+    if dataset.ckan_id in ckan_dataset_dict:
+        return ckan_dataset_dict[dataset.ckan_id]
+    if dataset.inspire_id and dataset.inspire_id in ckan_dataset_dict:
+        return ckan_dataset_dict[dataset.inspire_id]
+
+    return None
+
+def check_ckan_dataset_exists(dataset: object, ckan_dataset_dict: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Check if a dataset already exists in CKAN.
+
+    Args:
+        dataset (object): The dataset to check.
+        ckan_dataset_dict (Dict[str, Dict[str, Any]]): The CKAN datasets indexed by 'id' and 'inspire_id'.
+
+    Returns:
+        Optional[Dict[str, Any]]: The error if the dataset already exists, otherwise None.
+    """
+    dataset_id = dataset.ckan_id
+    inspire_id = dataset.inspire_id
+
+    # Check if the dataset already exists in CKAN. Use the indexed dictionary.
+    if dataset_id in ckan_dataset_dict or (inspire_id and inspire_id in ckan_dataset_dict):
+        matching_field = 'id' if dataset_id in ckan_dataset_dict else 'inspire_id'
+        error_message = f"Dataset exists in CKAN with the same '{matching_field}': {dataset_id if matching_field == 'id' else inspire_id}"
+        return {'title': dataset.title, 'id': dataset_id, 'inspire_id': inspire_id, 'error': error_message}
+
+    return None
+
+def is_ckan_dataset_conflict(error_dict: Dict[str, Any]) -> bool:
+    """Check if an error of create_ckan_datasets is a dataset that already exists in CKAN, not a failed request.
+
+    Args:
+        error_dict (Dict[str, Any]): The error of create_ckan_datasets.
+
+    Returns:
+        bool: True if the error was returned by check_ckan_dataset_exists.
+    """
+    return 'id' in error_dict
 
 def check_ckan_datasets_exists(ckan_site_url: str, authorization_key: str, datasets: object, ssl_unverified_mode: bool = False, ckan_dataset_errors: list = []):
     """Check if datasets already exist in CKAN.
@@ -359,23 +636,12 @@ def check_ckan_datasets_exists(ckan_site_url: str, authorization_key: str, datas
     Returns:
         tuple: A tuple containing the datasets that need to be loaded, a list of errors, and the number of datasets to load.
     """
-    ckan_dataset_list = get_ckan_datasets_list(ckan_site_url, ssl_unverified_mode, authorization_key)
+    ckan_dataset_dict = get_ckan_datasets_index(ckan_site_url, authorization_key, ssl_unverified_mode)
     ckan_datasets_to_load = []
-    
-    # Create a dict indexed by 'id' and 'inspire_id' for efficient searching
-    ckan_dataset_dict = {dataset.get('id'): dataset for dataset in ckan_dataset_list}
-    ckan_dataset_dict.update({dataset.get('inspire_id'): dataset for dataset in ckan_dataset_list if dataset.get('inspire_id')})
-    
+
     for dataset in datasets:
-        dataset_id = dataset.ckan_id
-        dataset_title = dataset.title
-        inspire_id = dataset.inspire_id
-        
-        # Check if the dataset already exists in CKAN. Use the indexed dictionary.
-        if dataset_id in ckan_dataset_dict or (inspire_id and inspire_id in ckan_dataset_dict):
-            matching_field = 'id' if dataset_id in ckan_dataset_dict else 'inspire_id'
-            error_message = f"Dataset exists in CKAN with the same '{matching_field}': {dataset_id if matching_field == 'id' else inspire_id}"
-            error_dict = {'title': dataset_title, 'id': dataset_id, 'inspire_id': inspire_id, 'error': error_message}
+        error_dict = check_ckan_dataset_exists(dataset, ckan_dataset_dict)
+        if error_dict is not None:
             ckan_dataset_errors.append(error_dict)
         else:
             ckan_datasets_to_load.append(dataset)
@@ -0,0 +1,66 @@
+# inbuilt libraries
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict
+
+# custom functions
+from config.ogc2ckan_config import get_log_module
+
+log_module = get_log_module(os.path.abspath(__file__))
+
+
+class HarvestStateStore:
+    """
+    State of the harvest servers kept between runs (e.g. date of the last harvest), one JSON file per server.
+
+    Attributes:
+        folder (str): Folder of the JSON files.
+    """
+    def __init__(self, folder: str):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _get_path(self, state_key: str) -> str:
+        return os.path.join(self.folder, f"{state_key}.json")
+
+    def get_state(self, state_key: str) -> Dict[str, Any]:
+        """
+        Returns the state of a harvest server.
+
+        Args:
+            state_key (str): Unique key of the harvest server.
+
+        Returns:
+            Dict[str, Any]: The state, empty if the server has not been harvested before.
+        """
+        try:
+            with open(self._get_path(state_key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logging.warning(f"{log_module}:Harvest state '{state_key}' is not valid JSON, ignoring it: {e}")
+            return {}
+
+    def save_state(self, state_key: str, **values):
+        """
+        Updates the state of a harvest server with the values.
+
+        The file is replaced atomically, so an interrupted run does not leave a corrupt state.
+
+        Args:
+            state_key (str): Unique key of the harvest server.
+            **values: The values to update.
+        """
+        state = self.get_state(state_key)
+        state.update(values)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=f".{state_key}", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._get_path(state_key))
+        except Exception:
+            os.remove(tmp_path)
+            raise
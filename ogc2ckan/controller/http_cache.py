@@ -0,0 +1,278 @@
+# inbuilt libraries
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# third-party libraries
+import requests
+from requests.structures import CaseInsensitiveDict
+import owslib.util
+
+# custom functions
+from config.ogc2ckan_config import get_log_module
+from mappings.default_ogc2ckan_config import OGC2CKAN_PATHS_CONFIG, OGC2CKAN_HTTP_CACHE_CONFIG
+
+log_module = get_log_module(os.path.abspath(__file__))
+
+
+class HTTPCache:
+    """
+    Disk cache of the HTTP responses of the OGC services (capabilities, CSW pages and records).
+
+    A cached response younger than the TTL is returned without any request. Otherwise the request is sent with
+    the 'If-None-Match'/'If-Modified-Since' headers of the cached response, and a '304 Not Modified' answer
+    returns the cached body. The servers without ETag or Last-Modified are compared by the hash of the body.
+
+    Attributes:
+        folder (str): Folder of the cached responses.
+        ttl (float): Seconds a cached response is used without revalidating it.
+        max_size (int): Maximum size in bytes of the cached responses.
+        max_age_days (float): Days a cached response not used is kept.
+        stats (Dict[str, int]): Requests served from the cache ('hits'), revalidated with a '304' ('revalidated'),
+            downloaded with the same body as the cached one ('unchanged') and downloaded ('misses').
+    """
+    CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+    def __init__(self, folder: str, ttl: float = 0, max_size: int = 1024 * 1024 * 1024, max_age_days: float = 30):
+        self.folder = folder
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_age_days = max_age_days
+        self.stats = dict.fromkeys(['hits', 'revalidated', 'unchanged', 'misses'], 0)
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def get_key(method: str, url: str, params: Any = None, data: Any = None) -> str:
+        """
+        Returns the key of a request: the hash of its method, URL, query parameters and body.
+        """
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='replace')
+        request = json.dumps([method.upper(), url, params, data], sort_keys=True, default=str)
+
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def _get_paths(self, key: str):
+        folder = os.path.join(self.folder, key[:2])
+        return os.path.join(folder, f"{key}.json"), os.path.join(folder, f"{key}.body")
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the metadata of a cached response, or None if it is not cached.
+        """
+        meta_path, body_path = self._get_paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if not os.path.exists(body_path):
+                return None
+            return entry
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _read_body(self, key: str) -> bytes:
+        _, body_path = self._get_paths(key)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+        # The modification time of the body is the last use of the response (eviction).
+        os.utime(body_path)
+        return body
+
+    def _write(self, path: str, content: bytes):
+        # Atomic replace, the cache is shared by the worker threads and processes.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def save(self, key: str, response: requests.Response, entry: Dict[str, Any]):
+        meta_path, body_path = self._get_paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        self._write(body_path, response.content)
+        self._write(meta_path, json.dumps(entry).encode('utf-8'))
+
+    @staticmethod
+    def _build_response(entry: Dict[str, Any], body: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.url = entry['url']
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    @staticmethod
+    def is_cacheable(response: requests.Response) -> bool:
+        # The OGC exception reports are returned with status 200, they are not cached so the request is retried.
+        return response.status_code == 200 and b'ExceptionReport' not in response.content[:2048]
+
+    def request(self, send, method: str, url: str, params: Any = None, data: Any = None, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        """
+        Sends a request through the cache.
+
+        Args:
+            send (Callable): The function that sends the request (requests.request).
+            method (str): HTTP method ('GET', 'POST').
+            url (str): The URL of the request.
+            params (Any, optional): The query parameters. Defaults to None.
+            data (Any, optional): The body. Defaults to None.
+            headers (Dict[str, str], optional): The headers. Defaults to None.
+            **kwargs: Other arguments of requests.request (timeout, auth, etc.).
+
+        Returns:
+            requests.Response: The response, from the cache or from the server.
+        """
+        key = self.get_key(method, url, params, data)
+        entry = self.load(key)
+
+        if entry is not None and time.time() - entry['stored_at'] < self.ttl:
+            try:
+                response = self._build_response(entry, self._read_body(key))
+                self._count('hits')
+                return response
+            except FileNotFoundError:
+                entry = None
+
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry['headers'].get('ETag'):
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        response = send(method, url, params=params, data=data, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            try:
+                cached_response = self._build_response(entry, self._read_body(key))
+                self._count('revalidated')
+                entry['stored_at'] = time.time()
+                meta_path, _ = self._get_paths(key)
+                self._write(meta_path, json.dumps(entry).encode('utf-8'))
+                return cached_response
+            except FileNotFoundError:
+                # Evicted in the meantime, request it again without the conditional headers.
+                headers.pop('If-None-Match', None)
+                headers.pop('If-Modified-Since', None)
+                response = send(method, url, params=params, data=data, headers=headers, **kwargs)
+
+        if not self.is_cacheable(response):
+            self._count('misses')
+            return response
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        self._count('unchanged' if entry is not None and entry.get('content_hash') == content_hash else 'misses')
+        self.save(key, response, {
+            'url': response.url or url,
+            'headers': {h: response.headers[h] for h in self.CACHED_HEADERS if h in response.headers},
+            'content_hash': content_hash,
+            'stored_at': time.time()
+        })
+
+        return response
+
+    def evict(self):
+        """
+        Removes the cached responses not used for max_age_days, then the least recently used until the cache is smaller than max_size.
+        """
+        entries = []
+        for shard in os.scandir(self.folder):
+            if not shard.is_dir():
+                continue
+            for f in os.scandir(shard.path):
+                if f.name.endswith('.body'):
+                    stat = f.stat()
+                    entries.append((stat.st_mtime, stat.st_size, f.path))
+
+        expired = time.time() - self.max_age_days * 86400
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, body_path in entries:
+            if mtime >= expired and total_size <= self.max_size:
+                break
+            for path in (body_path, body_path[:-len('.body')] + '.json'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+            removed += 1
+
+        if removed:
+            logging.info(f"{log_module}:HTTP cache evicted responses: {removed} | size: {total_size / 1024 / 1024:.1f} MB")
+
+
+class CachedRequests:
+    """
+    Replaces the 'requests' module used by OWSLib (owslib.util.openURL and http_post), so its requests go through the HTTP cache.
+    """
+    def __init__(self, cache: HTTPCache):
+        self.cache = cache
+
+    def request(self, method, url, **kwargs):
+        return self.cache.request(requests.request, method, url, **kwargs)
+
+    def get(self, url, params=None, **kwargs):
+        return self.request('GET', url, params=params, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        if 'json' in kwargs:
+            return requests.post(url, data=data, **kwargs)
+        return self.request('POST', url, data=data, **kwargs)
+
+    def __getattr__(self, name):
+        # requests.exceptions, requests.Session, etc.
+        return getattr(requests, name)
+
+
+_http_cache = None
+_http_cache_pid = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HTTPCache]:
+    """
+    Returns the HTTP cache of the current process, created on first use with the settings of the environment (HTTP_CACHE=True),
+    and installs it in OWSLib.
+
+    Returns:
+        Optional[HTTPCache]: The HTTP cache, or None if it is not enabled.
+    """
+    global _http_cache, _http_cache_pid
+    if not (True if os.environ.get('HTTP_CACHE') == 'True' else OGC2CKAN_HTTP_CACHE_CONFIG['enabled']):
+        return None
+
+    pid = os.getpid()
+    if _http_cache is None or _http_cache_pid != pid:
+        with _http_cache_lock:
+            if _http_cache is None or _http_cache_pid != pid:
+                # Imported here, ogc2ckan imports this module.
+                from ogc2ckan import APP_DIR
+                _http_cache = HTTPCache(
+                    folder=os.environ.get('HTTP_CACHE_FOLDER') or f"{APP_DIR}/{OGC2CKAN_PATHS_CONFIG['default_state_folder']}/{OGC2CKAN_HTTP_CACHE_CONFIG['folder']}",
+                    ttl=float(os.environ.get('HTTP_CACHE_TTL') or OGC2CKAN_HTTP_CACHE_CONFIG['ttl']),
+                    max_size=int(float(os.environ.get('HTTP_CACHE_MAX_SIZE') or OGC2CKAN_HTTP_CACHE_CONFIG['max_size']) * 1024 * 1024),
+                    max_age_days=float(os.environ.get('HTTP_CACHE_MAX_AGE_DAYS') or OGC2CKAN_HTTP_CACHE_CONFIG['max_age_days'])
+                )
+                _http_cache_pid = pid
+                owslib.util.requests = CachedRequests(_http_cache)
+    return _http_cache
@@ -0,0 +1,163 @@
+# inbuilt libraries
+import gzip
+import logging
+import os
+import ssl
+import threading
+import urllib.error
+import urllib.parse
+from typing import Dict, Optional
+
+# third-party libraries
+import urllib3
+from urllib3.exceptions import InsecureRequestWarning, MaxRetryError, SSLError
+from urllib3.util.retry import Retry
+
+# custom functions
+from config.ogc2ckan_config import get_log_module
+from mappings.default_ogc2ckan_config import OGC2CKAN_HTTP_CONFIG
+
+log_module = get_log_module(os.path.abspath(__file__))
+
+
+class HTTPTransport:
+    """
+    Shared HTTP transport for the CKAN API with keep-alive connection pools per host.
+
+    The TLS contexts are created once and reused by every connection. If SSL_UNVERIFIED_MODE is enabled,
+    the hosts whose certificate cannot be verified are remembered and sent directly to the unverified pool.
+
+    Attributes:
+        timeout (urllib3.Timeout): Connect and read timeouts of the requests.
+        retries (urllib3.Retry): Retry policy with exponential backoff.
+        pool_maxsize (int): Maximum number of connections kept alive per host.
+        num_pools (int): Maximum number of hosts kept in each pool manager.
+        gzip_requests (bool): Whether to gzip the request bodies. The server (or its proxy) must accept 'Content-Encoding: gzip'.
+        gzip_min_size (int): Minimum size in bytes of the request bodies to gzip.
+    """
+    def __init__(self, connect_timeout: float, read_timeout: float, retries: int, backoff_factor: float, pool_maxsize: int, num_pools: int, gzip_requests: bool = False, gzip_min_size: int = 1024):
+        self.timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        # POST requests (package_create, etc.) are not idempotent, so they are only retried on connection errors.
+        self.retries = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            other=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=True
+        )
+        self.pool_maxsize = pool_maxsize
+        self.num_pools = num_pools
+        self.gzip_requests = gzip_requests
+        self.gzip_min_size = gzip_min_size
+        self.headers = urllib3.make_headers(keep_alive=True, accept_encoding=True, user_agent='ogc2ckan')
+        self._verified_pool = self._pool_manager(ssl.create_default_context())
+        self._unverified_pool = None
+        self._unverified_hosts = set()
+        self._lock = threading.Lock()
+
+    def _pool_manager(self, ssl_context: ssl.SSLContext) -> urllib3.PoolManager:
+        return urllib3.PoolManager(
+            num_pools=self.num_pools,
+            maxsize=self.pool_maxsize,
+            block=False,
+            headers=self.headers,
+            timeout=self.timeout,
+            retries=self.retries,
+            ssl_context=ssl_context
+        )
+
+    def _get_unverified_pool(self) -> urllib3.PoolManager:
+        with self._lock:
+            if self._unverified_pool is None:
+                ssl_context = ssl.create_default_context()
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+                urllib3.disable_warnings(InsecureRequestWarning)
+                self._unverified_pool = self._pool_manager(ssl_context)
+            return self._unverified_pool
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None, ssl_unverified_mode: bool = False) -> urllib3.BaseHTTPResponse:
+        """
+        Sends an HTTP request using the pooled connections.
+
+        Args:
+            method (str): HTTP method ('GET', 'POST').
+            url (str): The URL to send the request to.
+            body (bytes, optional): The body of the request. Defaults to None.
+            headers (Dict[str, str], optional): Extra headers of the request. Defaults to None.
+            ssl_unverified_mode (bool, optional): Whether to retry without SSL verification if the certificate is invalid. Defaults to False.
+
+        Returns:
+            urllib3.BaseHTTPResponse: The response, with the body already read and decoded (gzip/deflate).
+
+        Raises:
+            ssl.CertificateError: If the host certificate is invalid and ssl_unverified_mode is False.
+            urllib.error.URLError: If the request fails after the retries.
+        """
+        host = urllib.parse.urlparse(url).netloc
+        request_headers = {**self.headers, **(headers or {})}
+
+        if self.gzip_requests and body is not None and len(body) >= self.gzip_min_size:
+            body = gzip.compress(body, compresslevel=5)
+            request_headers['Content-Encoding'] = 'gzip'
+
+        try:
+            if host in self._unverified_hosts:
+                return self._get_unverified_pool().request(method, url, body=body, headers=request_headers)
+            return self._verified_pool.request(method, url, body=body, headers=request_headers)
+
+        except MaxRetryError as e:
+            if not isinstance(e.reason, SSLError):
+                raise urllib.error.URLError(e.reason) from e
+            if not (ssl_unverified_mode == True or ssl_unverified_mode == "True"):
+                raise ssl.CertificateError(f"{log_module}:[INSECURE] Put SSL_UNVERIFIED_MODE=True if the host certificate is self-signed or invalid.") from e
+
+        # The certificate could not be verified, use the unverified pool for this host from now on.
+        with self._lock:
+            if host not in self._unverified_hosts:
+                logging.warning(f"{log_module}:[INSECURE] SSL certificate of '{host}' could not be verified. Using unverified SSL connections to this host.")
+                self._unverified_hosts.add(host)
+
+        try:
+            return self._get_unverified_pool().request(method, url, body=body, headers=request_headers)
+        except MaxRetryError as e:
+            raise urllib.error.URLError(e.reason) from e
+
+
+_transport = None
+_transport_pid = None
+_transport_lock = threading.Lock()
+
+
+def get_http_transport() -> HTTPTransport:
+    """
+    Returns the HTTP transport of the current process, created on first use with the settings of the environment.
+
+    The pools are not shared with the worker processes (PARALLELIZATION=True), each process creates its own.
+
+    Returns:
+        HTTPTransport: The shared HTTP transport.
+    """
+    global _transport, _transport_pid
+    pid = os.getpid()
+    if _transport is None or _transport_pid != pid:
+        with _transport_lock:
+            if _transport is None or _transport_pid != pid:
+                _transport = HTTPTransport(
+                    connect_timeout=float(os.environ.get('CKAN_HTTP_CONNECT_TIMEOUT') or OGC2CKAN_HTTP_CONFIG['connect_timeout']),
+                    read_timeout=float(os.environ.get('CKAN_HTTP_READ_TIMEOUT') or OGC2CKAN_HTTP_CONFIG['read_timeout']),
+                    retries=int(os.environ.get('CKAN_HTTP_RETRIES') or OGC2CKAN_HTTP_CONFIG['retries']),
+                    backoff_factor=float(os.environ.get('CKAN_HTTP_BACKOFF_FACTOR') or OGC2CKAN_HTTP_CONFIG['backoff_factor']),
+                    # At least one keep-alive connection per concurrent publisher (CKAN_PUBLISH_WORKERS).
+                    pool_maxsize=max(int(os.environ.get('CKAN_HTTP_POOL_MAXSIZE') or OGC2CKAN_HTTP_CONFIG['pool_maxsize']), int(os.environ.get('CKAN_PUBLISH_WORKERS') or 1)),
+                    num_pools=OGC2CKAN_HTTP_CONFIG['num_pools'],
+                    gzip_requests=True if os.environ.get('CKAN_HTTP_GZIP_REQUESTS') == 'True' else OGC2CKAN_HTTP_CONFIG['gzip_requests'],
+                    gzip_min_size=OGC2CKAN_HTTP_CONFIG['gzip_min_size']
+                )
+                _transport_pid = pid
+    return _transport
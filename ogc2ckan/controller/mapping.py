@@ -3,6 +3,9 @@ import yaml
 import os
 import pandas as pd
 import os
+import threading
+import time
+from typing import Any, Dict, Optional
 
 # custom functions
 from mappings.default_ogc2ckan_config import OGC2CKAN_PATHS_CONFIG
@@ -18,6 +21,103 @@ class MappingValueNotFoundError(Exception):
             f"Mapping value {self.value}  not found in {self.codelist}.yaml"
             )
 
+class CodelistRegistry:
+    """
+    Process-wide cache of the YAML codelists used by get_mapping_value.
+
+    Each codelist is loaded once, and indexed by a field ('id', 'topic_category', etc.) the first time it is
+    searched by it, so the lookups are dict lookups. The first entry with a value wins, as in a linear search.
+    The modification time of the files is checked at most every check_interval seconds, and a codelist is
+    reloaded if its file has changed.
+
+    Attributes:
+        check_interval (float): Seconds between the checks of the modification time of a codelist file.
+    """
+    def __init__(self, check_interval: float = 5):
+        self.check_interval = check_interval
+        self._codelists = {}
+        self._lock = threading.Lock()
+
+    def _load(self, yaml_path: str) -> Dict[str, Any]:
+        stat = os.stat(yaml_path)
+        with open(yaml_path, 'r', encoding="utf-8") as file:
+            map_yaml = yaml.safe_load(file)
+        if not isinstance(map_yaml, list):
+            raise ValueError("The YAML file does not contain a valid list.")
+
+        return {'mtime': (stat.st_mtime_ns, stat.st_size), 'checked_at': time.monotonic(), 'entries': map_yaml, 'indexes': {}}
+
+    def get_codelist(self, yaml_path: str) -> Dict[str, Any]:
+        """
+        Returns the cached codelist of a YAML file, loaded or reloaded if needed.
+
+        Args:
+            yaml_path (str): The path of the YAML file.
+
+        Returns:
+            Dict[str, Any]: The 'entries' of the codelist and their 'indexes' by field.
+
+        Raises:
+            ValueError: If the YAML file does not contain a list.
+        """
+        codelist = self._codelists.get(yaml_path)
+        if codelist is not None and time.monotonic() - codelist['checked_at'] < self.check_interval:
+            return codelist
+
+        with self._lock:
+            codelist = self._codelists.get(yaml_path)
+            if codelist is not None:
+                stat = os.stat(yaml_path)
+                if (stat.st_mtime_ns, stat.st_size) == codelist['mtime']:
+                    codelist['checked_at'] = time.monotonic()
+                    return codelist
+            codelist = self._load(yaml_path)
+            self._codelists[yaml_path] = codelist
+            return codelist
+
+    def get_index(self, codelist: Dict[str, Any], field_input: str) -> Dict[Any, dict]:
+        """
+        Returns the index of the entries of a codelist by the value of a field, built on first use.
+        """
+        index = codelist['indexes'].get(field_input)
+        if index is None:
+            index = {}
+            for mapping in codelist['entries']:
+                if isinstance(mapping, dict) and field_input in mapping:
+                    try:
+                        index.setdefault(mapping[field_input], mapping)
+                    except TypeError:
+                        # Unhashable values (lists, dicts) are only found by get_entry with a linear search.
+                        pass
+            codelist['indexes'][field_input] = index
+        return index
+
+    def get_entry(self, yaml_path: str, value: Any, field_input: str = 'id') -> Optional[dict]:
+        """
+        Returns the first entry of a codelist whose field_input is value.
+
+        Args:
+            yaml_path (str): The path of the YAML file.
+            value (Any): The value to search for.
+            field_input (str, optional): Name of the field to search for. Defaults to 'id'.
+
+        Returns:
+            Optional[dict]: The entry, or None if the value is not found.
+        """
+        codelist = self.get_codelist(yaml_path)
+        try:
+            return self.get_index(codelist, field_input).get(value)
+        except TypeError:
+            return next((m for m in codelist['entries'] if isinstance(m, dict) and field_input in m and m[field_input] == value), None)
+
+    def clear(self):
+        with self._lock:
+            self._codelists.clear()
+
+
+codelist_registry = CodelistRegistry()
+
+
 def get_mapping_value(
     value: str,
     codelist: str,
@@ -27,8 +127,9 @@ def get_mapping_value(
     """
     Returns the mapping value in YAML for a given codelist value.
 
-    This function loads a YAML file from the specified mappings folder and returns the value
-    for the specified codelist value. If the value is not found in the YAML file, the category itself is returned.
+    This function searches the YAML file of the specified mappings folder, cached by codelist_registry, and
+    returns the value for the specified codelist value. If the value is not found in the YAML file, the category
+    itself is returned.
 
     Args:
         value: The source value that needs to be mapped to a codelist value.
@@ -45,16 +146,12 @@ def get_mapping_value(
     """
     try:
         yaml_path = os.path.join(mappings_folder, codelist + ".yaml")
-        with open(yaml_path, 'r', encoding="utf-8") as file:
-            map_yaml = yaml.safe_load(file)
-            if not isinstance(map_yaml, list):
-                raise ValueError("The YAML file does not contain a valid list.")
+        mapping = codelist_registry.get_entry(yaml_path, value, field_input)
     except ValueError:
         raise MappingValueNotFoundError(value, codelist) from None
 
-    for mapping in map_yaml:
-        if isinstance(mapping, dict) and field_input in mapping and mapping[field_input] == value:
-            return mapping.get(field_output, value)
+    if mapping is not None:
+        return mapping.get(field_output, value)
 
     return value
 
@@ -0,0 +1,165 @@
+# inbuilt libraries
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+# custom functions
+from config.ogc2ckan_config import get_log_module
+
+log_module = get_log_module(os.path.abspath(__file__))
+
+# End of the producer iterable.
+_SENTINEL = object()
+
+
+class _ProducerError:
+    """
+    Wraps an exception raised by the producer thread so it can be raised again in the consumer.
+    """
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def iter_bounded_queue(iterable: Iterable[Any], maxsize: int = 100, name: str = 'producer') -> Iterator[Any]:
+    """
+    Iterates over an iterable consumed by a producer thread through a bounded queue.
+
+    The producer thread (e.g. fetching and mapping datasets) runs ahead of the consumer (e.g. posting
+    datasets to CKAN) until the queue is full, then it waits, so no more than 'maxsize' items are held in memory.
+
+    Args:
+        iterable (Iterable[Any]): The iterable to consume in the producer thread.
+        maxsize (int, optional): Maximum number of items waiting in the queue. Defaults to 100.
+        name (str, optional): Name of the producer thread. Defaults to 'producer'.
+
+    Yields:
+        Any: The items of the iterable in the same order.
+
+    Raises:
+        Exception: Any exception raised by the iterable in the producer thread.
+    """
+    items = queue.Queue(maxsize=max(int(maxsize), 1))
+    stop = threading.Event()
+
+    def put(item):
+        # Wait for a free slot, but give up if the consumer has stopped.
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            logging.error(f"{log_module}:Error in the '{name}' thread: {e}")
+            put(_ProducerError(e))
+            return
+        put(_SENTINEL)
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _SENTINEL:
+                break
+            if isinstance(item, _ProducerError):
+                raise item.exception
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+class RateLimiter:
+    """
+    Limits the number of calls per second, shared by all the threads that use it.
+
+    Attributes:
+        rate (float): Maximum number of calls per second. If None or 0, there is no limit.
+    """
+    def __init__(self, rate: Optional[float] = None):
+        self.rate = rate
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the next call is allowed.
+        """
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self._interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def iter_concurrent(func: Callable[[Any], Any], iterable: Iterable[Any], max_in_flight: int = 1, rate_limit: Optional[float] = None, name: str = 'worker') -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Calls a function for each item of an iterable in a thread pool, with a maximum number of calls in flight.
+
+    The iterable is consumed lazily: a new item is only taken when one of the calls in flight has finished.
+    The results are yielded in the calling thread, in completion order, so counters and error lists can be
+    updated by the caller without locks.
+
+    Args:
+        func (Callable[[Any], Any]): The function to call with each item.
+        iterable (Iterable[Any]): The items to process.
+        max_in_flight (int, optional): Maximum number of concurrent calls. If 1, the calls are made serially in the calling thread. Defaults to 1.
+        rate_limit (float, optional): Maximum number of calls started per second. Defaults to None (no limit).
+        name (str, optional): Prefix of the names of the worker threads. Defaults to 'worker'.
+
+    Yields:
+        Tuple[Any, Any, Optional[Exception]]: The item, the result of the call (None if it failed) and the exception raised (None if it succeeded).
+    """
+    rate_limiter = RateLimiter(rate_limit)
+    max_in_flight = max(int(max_in_flight or 1), 1)
+
+    if max_in_flight == 1:
+        for item in iterable:
+            rate_limiter.wait()
+            try:
+                yield item, func(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=name) as executor:
+        in_flight = {}
+        items = iter(iterable)
+        exhausted = False
+
+        while in_flight or not exhausted:
+            # Fill the free slots.
+            while not exhausted and len(in_flight) < max_in_flight:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                rate_limiter.wait()
+                in_flight[executor.submit(func, item)] = item
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                exception = future.exception()
+                yield item, None if exception else future.result(), exception
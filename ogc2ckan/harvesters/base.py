@@ -1,5 +1,7 @@
 # inbuilt libraries
+import hashlib
 import inspect
+import json
 import uuid
 import re
 import unicodedata
@@ -23,6 +25,8 @@ from owslib import util
 from controller import ckan_management
 from model.custom_organization import CustomOrganization
 from controller.mapping import get_mapping_value
+from controller.pipeline import iter_bounded_queue
+from controller.harvest_state import HarvestStateStore
 from config.ogc2ckan_config import load_yaml, get_log_module
 from mappings.default_ogc2ckan_config import OGC2CKAN_PATHS_CONFIG, OGC2CKAN_HARVESTER_MD_CONFIG, OGC2CKAN_CKANINFO_CONFIG, OGC2CKAN_MD_FORMATS, OGC2CKAN_ISO_MD_ELEMENTS, OGC2CKAN_MD_MULTILANG_FIELDS, BCP_47_LANGUAGE
 from harvesters.harvesters import get_harvester_class
@@ -81,6 +85,7 @@ class Harvester:
         from_harvest_server(cls, harvest_server): Returns a new Harvester object based on a HarvestServer object.
         _create_harvester_from_server(harvest_server, harvester_class): Creates a new Harvester object from a HarvestServer object and a Harvester class.
         create_datasets(self, ckan_info): Creates new datasets in a CKAN instance based on the harvested datasets.
+        get_summary(self): Returns a picklable summary of the harvest results.
         get_all_datasets(self, ckan_info): Gets all datasets from the server.
 
     '''
@@ -103,10 +108,18 @@ class Harvester:
         self.datadictionaries = []
         self.ckan_dataset_count = 0
         self.source_dataset_count = 0
+        self.ckan_dataset_updated_count = 0
+        self.ckan_dataset_unchanged_count = 0
         self.ckan_dataset_errors = []
         self.ckan_dictionaries_count = 0
         self.source_dictionaries_count = 0
         self.ckan_dictionaries_errors = []
+        self.harvest_status = None
+        self.http_cache_stats = {}
+        # Records of the source removed since the last harvest, to withdraw them from CKAN
+        self.source_removed_records = []
+        # Values saved with the source fingerprint (e.g. the capabilities updateSequence)
+        self.source_state = {}
         # Additional custom organization info (ckan-harvester/src/ckan/ogc_ckan/custom/mappings)
         self.custom_organization_info = CustomOrganization(self) if custom_organization_active else None
         default_localized_strings_file = f"{self.app_dir}/{OGC2CKAN_PATHS_CONFIG['default_mappings_folder']}/{OGC2CKAN_PATHS_CONFIG['default_localized_strings_file']}"
@@ -154,24 +167,172 @@ class Harvester:
 
         :return: CSW Records and CKAN New records counters and Datasets object
         '''
-
-        # Get all datasets
-        self.get_datasets(ckan_info)
-
-        if hasattr(self, 'workspaces') and self.workspaces:
-            logging.info(f"{log_module}:{self.name} ({self.type.upper()}) server OGC workspaces selected: {', '.join([w.upper() for w in self.workspaces])}")
-
-            # Create datasets using ckan_management
-            self.ckan_dataset_count, self.source_dataset_count, self.ckan_dataset_errors = ckan_management.create_ckan_datasets(ckan_info.ckan_site_url, ckan_info.authorization_key, self.datasets, ckan_info.dataset_multilang, ckan_info.ssl_unverified_mode, self.workspaces)
-
+        # Skip the server if its source has not changed since the last harvest (SKIP_UNCHANGED_SOURCES)
+        fingerprint = self.get_harvest_fingerprint(ckan_info) if ckan_info.skip_unchanged_sources else None
+        if fingerprint is not None and fingerprint == self.get_harvest_state().get('source_fingerprint'):
+            logging.info(f"{log_module}:{self.name} ({self.type.upper()}) source unchanged since the last harvest, skipping the server")
+            self.harvest_status = 'unchanged'
+            return
+
+        workspaces = getattr(self, 'workspaces', None) or None
+        if workspaces:
+            logging.info(f"{log_module}:{self.name} ({self.type.upper()}) server OGC workspaces selected: {', '.join([w.upper() for w in workspaces])}")
+
+        # Only check the existing datasets of the organization of the server if CKAN_INDEX_SCOPE=organization.
+        organization = self.organization if ckan_info.ckan_index_scope == 'organization' else None
+
+        if ckan_info.streaming_mode:
+            # Harvest the datasets in a producer thread while the datasets already mapped are created in CKAN
+            datasets = iter_bounded_queue(self.iter_datasets(ckan_info), ckan_info.streaming_queue_size, name=f"{self.type}-{self.name}")
         else:
-            # Create datasets using ckan_management
-            self.ckan_dataset_count, self.source_dataset_count, self.ckan_dataset_errors = ckan_management.create_ckan_datasets(ckan_info.ckan_site_url, ckan_info.authorization_key, self.datasets, ckan_info.dataset_multilang, ckan_info.ssl_unverified_mode)
+            # Get all datasets
+            datasets = self.get_datasets(ckan_info)
+
+        # Create datasets using ckan_management
+        self.ckan_dataset_count, self.source_dataset_count, self.ckan_dataset_errors, self.ckan_dataset_updated_count, self.ckan_dataset_unchanged_count = ckan_management.create_ckan_datasets(ckan_info.ckan_site_url, ckan_info.authorization_key, datasets, ckan_info.dataset_multilang, ckan_info.ssl_unverified_mode, workspaces, ckan_info.publish_workers, ckan_info.publish_rate_limit, self.get_upsert_mode(ckan_info), organization, ckan_info.ckan_index_rows, ckan_info.ckan_index_workers, ckan_info.ckan_index_persistent, ckan_info.ckan_index_full_refresh_days)
 
         # Create data dictionaries using ckan_management
         if self.datadictionaries:
             self.ckan_dictionaries_count, self.source_dictionaries_count, self.ckan_dictionaries_errors = ckan_management.create_ckan_datadictionaries(ckan_info.ckan_site_url, ckan_info.authorization_key, self.datadictionaries, ckan_info.ssl_unverified_mode)
 
+        # The fingerprint is only saved if nothing failed, so the failed datasets are harvested again in the next run.
+        if fingerprint is not None:
+            if self.has_harvest_errors():
+                logging.warning(f"{log_module}:{self.name} ({self.type.upper()}) source fingerprint not saved, some datasets or data dictionaries failed")
+            else:
+                self.save_harvest_state(source_fingerprint=fingerprint, **self.source_state)
+
+    def get_upsert_mode(self, ckan_info):
+        '''
+        Whether the datasets that already exist in CKAN are updated (CKAN_UPSERT_MODE).
+
+        :param ckan_info: CKAN Parameters from config.yaml
+
+        :return: True if the existing datasets are updated
+        '''
+        return ckan_info.upsert_mode
+
+    def has_harvest_errors(self):
+        '''
+        Whether some datasets or data dictionaries failed to be created in CKAN. The datasets that already exist
+        (conflicts) are not errors.
+
+        :return: True if some datasets or data dictionaries failed
+        '''
+        return bool(self.ckan_dictionaries_errors) or not all(ckan_management.is_ckan_dataset_conflict(e) for e in self.ckan_dataset_errors)
+
+    def get_datasets(self, ckan_info):
+        '''
+        Gets all datasets from the server.
+
+        :param ckan_info: CKAN Parameters from config.yaml
+
+        :return: List of Dataset objects
+        '''
+        self.datasets.extend(self.iter_datasets(ckan_info))
+
+        return self.datasets
+
+    def iter_datasets(self, ckan_info):
+        '''
+        Yields the datasets of the server one by one as they are harvested. Implemented by each harvester.
+
+        :param ckan_info: CKAN Parameters from config.yaml
+
+        :return: Generator of Dataset objects
+        '''
+        raise NotImplementedError(f"{log_module}:Harvester type: '{self.type}' does not implement 'iter_datasets'")
+
+    def get_source_fingerprint(self, ckan_info):
+        '''
+        Returns a cheap fingerprint of the source (e.g. the capabilities updateSequence or the size and date of the files),
+        to skip the server if it has not changed since the last harvest. Implemented by each harvester.
+
+        :param ckan_info: CKAN Parameters from config.yaml
+
+        :return: The fingerprint of the source, or None if the server must always be harvested
+        '''
+        return None
+
+    def get_harvest_fingerprint(self, ckan_info):
+        '''
+        Returns the fingerprint of the source and of the settings of the server, so a change in config.yaml or in the
+        version of ogc2ckan also harvests the server again.
+
+        :param ckan_info: CKAN Parameters from config.yaml
+
+        :return: SHA-256 of the fingerprints, or None if the source has no fingerprint
+        '''
+        try:
+            source_fingerprint = self.get_source_fingerprint(ckan_info)
+        except Exception as e:
+            logging.warning(f"{log_module}:{self.name} ({self.type.upper()}) source fingerprint not available: {e}")
+            return None
+        if source_fingerprint is None:
+            return None
+
+        settings = {k: v for k, v in vars(self).items() if k in ['url', 'name', 'groups', 'organization', 'custom_organization_active', 'custom_organization_mapping_file', 'private_datasets', 'default_keywords', 'default_inspire_info', 'ckan_name_not_uuid', 'constraints', 'workspaces']}
+        settings['default_dcat_info'] = vars(self.default_dcat_info) if self.default_dcat_info else None
+        settings['ckan_info'] = [ckan_info.ckan_site_url, ckan_info.ckan_dataset_schema, ckan_info.dataset_multilang, ckan_info.default_license, ckan_info.default_license_id, ckan_info.metadata_distributions]
+        settings['version'] = os.environ.get('VERSION')
+        fingerprint = json.dumps([source_fingerprint, settings], sort_keys=True, default=str)
+
+        return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+    def get_harvest_state_key(self):
+        '''
+        Returns the unique key of the server in the harvest state store.
+
+        :return: Type and name of the server and a hash of its URL
+        '''
+        url_hash = hashlib.sha1(self.url.rstrip('/').encode('utf-8')).hexdigest()[:12]
+        name = re.sub(r'[^A-Za-z0-9_-]+', '_', self.name)
+
+        return f"{self.type}_{name}_{url_hash}"
+
+    def get_harvest_state(self):
+        '''
+        Returns the state of the server saved by the previous harvests.
+
+        :return: Dict with the state of the server, empty if it has not been harvested before
+        '''
+        return HarvestStateStore(self.get_harvest_state_folder()).get_state(self.get_harvest_state_key())
+
+    def save_harvest_state(self, **values):
+        '''
+        Saves the state of the server for the next harvests.
+
+        :param values: The values to update in the state of the server
+        '''
+        HarvestStateStore(self.get_harvest_state_folder()).save_state(self.get_harvest_state_key(), **values)
+
+    def get_harvest_state_folder(self):
+        return f"{self.app_dir}/{OGC2CKAN_PATHS_CONFIG['default_state_folder']}/harvest_state"
+
+    def get_summary(self):
+        '''
+        Returns the harvest results as a picklable dictionary, so the counters and errors can be returned from a worker process.
+
+        Returns:
+            dict: Harvester server info, datasets/data dictionaries counters and errors.
+        '''
+        return {
+            'name': self.name,
+            'type': self.type,
+            'url': self.url,
+            'status': self.harvest_status,
+            'source_dataset_count': self.source_dataset_count,
+            'ckan_dataset_count': self.ckan_dataset_count,
+            'ckan_dataset_updated_count': self.ckan_dataset_updated_count,
+            'ckan_dataset_unchanged_count': self.ckan_dataset_unchanged_count,
+            'ckan_dataset_errors': list(self.ckan_dataset_errors),
+            'source_dictionaries_count': self.source_dictionaries_count,
+            'ckan_dictionaries_count': self.ckan_dictionaries_count,
+            'ckan_dictionaries_errors': list(self.ckan_dictionaries_errors),
+            'http_cache_stats': dict(self.http_cache_stats),
+            'source_removed_records': list(self.source_removed_records),
+        }
+
     def get_dataset_common_elements(self, record: str, ckan_dataset_schema: str) -> tuple:
         """
         Generates common elements for harvesting a dataset.
@@ -336,8 +497,15 @@ class Harvester:
         Returns:
             dict: Dictionary containing metadata values.
         """
+        return self._ows_get_metadata_not_owslib(layer_info, self.ows_namespaces)
+
+    @staticmethod
+    def _ows_get_metadata_not_owslib(layer_info, namespaces):
+        """
+        Gets metadata values that are not retrieved by OWSLib from an MD_Metadata object, without a harvester (e.g. in a worker process).
+        """
         return {
-            "lineage_source": self._ows_findall_metadata_elements(layer_info, self.ows_namespaces, OGC2CKAN_ISO_MD_ELEMENTS['lineage_source'])
+            "lineage_source": Harvester._ows_findall_metadata_elements(layer_info, namespaces, OGC2CKAN_ISO_MD_ELEMENTS['lineage_source'])
         }
 
     def ows_get_keywords(self, dataset, keywords):
@@ -399,6 +567,8 @@ class Harvester:
         issued_date = datetime.now().strftime('%Y-%m-%d')
         created_date = '1900-01-01'
         modified_date = issued_date
+        # Without a revision date the modified date is the harvest date, it is not part of the content hash.
+        harvest_date_fields = ['modified']
 
         for date in record_id.date:
             if date.type == "creation":
@@ -407,10 +577,12 @@ class Harvester:
                 issued_date = self._normalize_date(date.date)
             elif date.type == "revision":
                 modified_date = self._normalize_date(date.date)
+                harvest_date_fields = []
 
         dataset.set_issued(issued_date)
         dataset.set_created(created_date)
         dataset.set_modified(modified_date)
+        dataset.set_harvest_date_fields(harvest_date_fields)
 
         return issued_date, modified_date
 
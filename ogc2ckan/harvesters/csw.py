@@ -1,12 +1,18 @@
 # inbuilt libraries
-from datetime import datetime
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import logging
+import threading
+import time
 import uuid
 import os
 
 # third-party libraries
 from owslib.csw import CatalogueServiceWeb
-from owslib.fes import PropertyIsLike, SortBy, SortProperty
+from owslib.fes import Or, PropertyIsEqualTo, PropertyIsGreaterThanOrEqualTo, PropertyIsLike, SortBy, SortProperty
+from owslib.ows import ExceptionReport
+from owslib.util import ServiceException
 from owslib.namespaces import Namespaces
 
 # custom classes
@@ -42,6 +48,12 @@ class HarvesterCSW(Harvester):
         self.csw_url = None
         self.constraint_keywords = self.set_constraint_keywords(constraints)
         self.constraint_mails = self.set_constraint_mails(constraints)
+        self.constraint_organisations = self.set_constraint_organisations(constraints)
+        self.constraint_pushdown = True
+        self.harvest_started = None
+        self.harvest_state = {}
+        self.harvest_records = None
+        self.full_harvest = True
 
     def set_csw_url(self, csw_url):
         self.csw_url = csw_url
@@ -52,6 +64,51 @@ class HarvesterCSW(Harvester):
     def set_constraint_mails(self, constraints):
         return [mail.lower().replace(' ','') for mail in constraints["mails"]]
 
+    def set_constraint_organisations(self, constraints):
+        return [organisation.strip() for organisation in constraints.get("organisations") or []]
+
+    def get_constraint_filter(self, *constraint_groups):
+        """
+        Combines groups of constraints as an AND of the groups, and an OR of the constraints of each group.
+
+        Args:
+            *constraint_groups (list): The groups of constraints (OgcExpression from owslib.fes module). Empty groups are ignored.
+
+        Returns:
+            list: The constraints of getrecords2. A nested list is an AND of its constraints (OWSLib).
+        """
+        groups = [group for group in constraint_groups if group]
+        if len(groups) == 1:
+            return list(groups[0])
+
+        return [[Or(group) if len(group) > 1 else group[0] for group in groups]] if groups else []
+
+    def get_pushdown_constraints(self):
+        """
+        Returns the constraint mails and organisations as OGC filters, so the server only returns the records that may match them.
+
+        The mails are searched in 'csw:anyText', there is no contact email queryable, so the records are still filtered
+        by their contact email. The organisations are compared with 'apiso:OrganisationName'.
+
+        Returns:
+            list: The groups of constraints of the mails and organisations.
+        """
+        return [
+            [PropertyIsLike("csw:anyText", f"%{mail}%", matchCase=False) for mail in self.constraint_mails],
+            [PropertyIsEqualTo("apiso:OrganisationName", organisation, matchcase=False) for organisation in self.constraint_organisations]
+        ]
+
+    def match_constraint_organisations(self, record):
+        """
+        Whether the organisation of a contact of an ISO record is in constraints.organisations, or there are no constraint organisations.
+        """
+        if not self.constraint_organisations:
+            return True
+        contacts = list(getattr(record, 'contact', None) or []) + list(getattr(getattr(record, 'identification', None), 'contact', None) or [])
+        organisations = [organisation.lower() for organisation in self.constraint_organisations]
+
+        return any((getattr(contact, 'organization', None) or '').strip().lower() in organisations for contact in contacts)
+
     def get_csw_url_value(self):
         return self.csw_url
 
@@ -61,20 +118,186 @@ class HarvesterCSW(Harvester):
     def connect_csw(self):
         return CatalogueServiceWeb(self.get_csw_url())
 
-    def get_datasets(self, ckan_info):
-        self.csw = self.get_csw_records()
+    def iter_datasets(self, ckan_info):
+        constraints, fallback_constraints = self.get_harvest_constraints(ckan_info)
+
+        if ckan_info.csw_two_phase_mode:
+            records = self.iter_changed_csw_records(ckan_info, constraints, fallback_constraints)
+        else:
+            records = self.iter_csw_records(page=ckan_info.csw_page_size, workers=ckan_info.csw_page_workers, retries=ckan_info.csw_page_retries, constraints=constraints, fallback_constraints=fallback_constraints)
+
+        # Records are mapped page by page and their XML trees released, so memory depends on the page size.
+        for record, layer_info in records:
+            yield self.get_dataset(ckan_info, record, 'csw', layer_info)
+            self.release_csw_record(layer_info)
+
+    def get_upsert_mode(self, ckan_info):
+        # The modified records already exist in CKAN, without upsert they would be reported as conflicts and never updated.
+        if (ckan_info.csw_incremental_mode or ckan_info.csw_two_phase_mode) and not ckan_info.upsert_mode:
+            mode = 'CSW_INCREMENTAL_MODE' if ckan_info.csw_incremental_mode else 'CSW_TWO_PHASE_MODE'
+            logging.warning(f"{log_module}:{self.name} ({self.type.upper()}) {mode}=True updates the modified datasets, enabling CKAN_UPSERT_MODE for this server")
+            return True
+        return super().get_upsert_mode(ckan_info)
+
+    def create_datasets(self, ckan_info):
+        super().create_datasets(ckan_info)
+
+        # Only a completed harvest moves the date of the next incremental harvest, so the failed records are harvested again.
+        if (ckan_info.csw_incremental_mode or ckan_info.csw_two_phase_mode) and self.harvest_started is not None:
+            if self.has_harvest_errors():
+                logging.warning(f"{log_module}:{self.name} (CSW) incremental harvest state not saved, some datasets or data dictionaries failed")
+                return
+            state = {'last_harvest': self.harvest_started.isoformat()}
+            if self.full_harvest:
+                state['last_full_harvest'] = self.harvest_started.isoformat()
+            if self.harvest_records is not None:
+                state['records'] = self.harvest_records
+            self.save_harvest_state(**state)
+
+    def get_source_fingerprint(self, ckan_info):
+        """
+        Returns the fingerprint of the CSW server: the number of records matched by the constraints and the latest
+        modification date, from one GetRecords request of the most recently modified summary record.
+
+        Args:
+            ckan_info (CKANInfo): CKANInfo object with the CSW settings.
+
+        Returns:
+            str: The number of records and the latest modification date.
+        """
+        pages = self.iter_csw_pages(esn='summary', outputschema=Namespaces().get_namespace('csw'), page=1, limit=1,
+                                    sortproperty='apiso:Modified', sortorder='DESC')
+        records = next(pages)
+        pages.close()
+        modified = next(iter(records.values())).modified if records else None
+
+        return f"{self.csw.results['matches']}:{modified}"
+
+    def iter_changed_csw_records(self, ckan_info, constraints, fallback_constraints=None):
+        """
+        Two-phase harvest (CSW_TWO_PHASE_MODE): lists the identifiers and modification dates of the records with
+        light Dublin Core summary records, then only requests the full ISO records that are new or modified since
+        the last harvest, in concurrent GetRecordById batches.
+
+        Args:
+            ckan_info (CKANInfo): CKANInfo object with the CSW settings.
+            constraints (list): The constraints of the listing.
+            fallback_constraints (list, optional): The constraints of the listing if the server rejects the constraints. Defaults to None.
+
+        Yields:
+            Tuple[str, MD_Metadata]: The identifier and the record, filtered by the constraint mails and organisations.
+        """
+        # dct:modified is in the summary records, brief records only have the identifier, title and type.
+        listing = OrderedDict()
+        for page_records in self.iter_csw_pages(esn='summary', outputschema=Namespaces().get_namespace('csw'), page=ckan_info.csw_list_page_size,
+                                                workers=ckan_info.csw_page_workers, retries=ckan_info.csw_page_retries, constraints=constraints,
+                                                fallback_constraints=fallback_constraints):
+            for identifier, record in page_records.items():
+                listing[identifier] = record.modified
+
+        previous_records = self.harvest_state.get('records') or {}
+        if self.full_harvest:
+            identifiers = list(listing)
+        else:
+            # Records without modification date are always requested.
+            identifiers = [i for i, modified in listing.items() if modified is None or previous_records.get(i) != modified]
+
+        # An incremental listing only has the modified records, the rest are kept.
+        incremental_listing = ckan_info.csw_incremental_mode and not self.full_harvest
+        if incremental_listing:
+            self.harvest_records = {**previous_records, **listing}
+        else:
+            self.harvest_records = dict(listing)
+            self.source_removed_records = sorted(set(previous_records) - set(listing))
+            if self.source_removed_records:
+                logging.warning(f"{log_module}:{self.name} (CSW) records no longer in the server since the last harvest: {len(self.source_removed_records)}")
 
-        for record in self.csw.records:
-            self.datasets.append(self.get_dataset(ckan_info, record, 'csw'))
+        logging.info(f"{log_module}:{self.name} (CSW) records listed: {len(listing)}, new or modified: {len(identifiers)}")
 
-        return self.datasets
+        yield from self.iter_csw_records_by_id(identifiers, batch_size=ckan_info.csw_records_batch_size,
+                                               workers=ckan_info.csw_page_workers, retries=ckan_info.csw_page_retries)
+
+    def get_harvest_constraints(self, ckan_info):
+        """
+        Returns the constraints of the GetRecords requests: the keywords, the mails and organisations, and in incremental
+        mode (CSW_INCREMENTAL_MODE) the records modified since the last harvest of the server.
+
+        In incremental or two-phase mode (CSW_TWO_PHASE_MODE), a full harvest is done if the server has not been harvested
+        before, or its last full harvest is older than CSW_FULL_HARVEST_DAYS, so the records not harvested incrementally
+        (e.g. failed) are reconciled.
+
+        Args:
+            ckan_info (CKANInfo): CKANInfo object with the incremental mode settings.
+
+        Returns:
+            Tuple[list, list]: The constraints with the mails and organisations pushed down to the server, and the
+                constraints without them if the server rejects them (OgcExpression from owslib.fes module).
+        """
+        self.harvest_started = datetime.now(timezone.utc)
+        self.full_harvest = True
+        constraint_modified = self.get_constraint_modified(ckan_info)
+
+        return (self.get_constraint_filter(self.constraint_keywords, *self.get_pushdown_constraints(), constraint_modified),
+                self.get_constraint_filter(self.constraint_keywords, constraint_modified))
+
+    def get_constraint_modified(self, ckan_info):
+        """
+        Returns the constraint of the records modified since the last harvest of the server in incremental mode, and
+        sets whether it is a full harvest.
+
+        Args:
+            ckan_info (CKANInfo): CKANInfo object with the incremental mode settings.
+
+        Returns:
+            list: The constraint of the modification date, empty if all the records are harvested.
+        """
+        if not (ckan_info.csw_incremental_mode or ckan_info.csw_two_phase_mode):
+            return []
+
+        self.harvest_state = self.get_harvest_state()
+        last_harvest = self.harvest_state.get('last_harvest')
+        last_full_harvest = self.harvest_state.get('last_full_harvest')
+        if last_harvest is None or last_full_harvest is None or self.harvest_started - datetime.fromisoformat(last_full_harvest) > timedelta(days=ckan_info.csw_full_harvest_days):
+            logging.info(f"{log_module}:{self.name} (CSW) full harvest, last full harvest: {last_full_harvest}")
+            return []
+
+        self.full_harvest = False
+        if not ckan_info.csw_incremental_mode:
+            return []
+
+        # Metadata dates (gmd:dateStamp) are usually dates without time zone, so the day before the last harvest is included.
+        modified_since = (datetime.fromisoformat(last_harvest) - timedelta(days=1)).date().isoformat()
+        logging.info(f"{log_module}:{self.name} (CSW) incremental harvest, records modified since: {modified_since}")
+
+        return [PropertyIsGreaterThanOrEqualTo('apiso:Modified', modified_since)]
+
+    def get_operation_url(self, csw, operation, method):
+        """
+        Returns the URL of an operation and HTTP method ('get', 'post') of the CSW capabilities, or the CSW URL if it is not available.
+        """
+        try:
+            verbs = [x for x in csw.get_operation_by_name(operation).methods if x.get('type').lower() == method]
+            return verbs[0].get('url') or csw.url
+        except Exception:
+            return csw.url
+
+    @staticmethod
+    def release_csw_record(layer_info):
+        """
+        Releases the XML trees of a CSW record once it has been mapped to a dataset.
+        """
+        layer_info.md = None
+        layer_info.xml = None
 
     def get_csw_records(self, typenames="csw:Record", limit=None,
                         esn="full", outputschema="http://www.isotc211.org/2005/gmd",
-                        page=30, startposition=0, sortproperty='dc:identifier'):
+                        page=30, startposition=0, sortproperty='dc:identifier',
+                        workers=1, retries=0):
         """
         Retrieve records from a CSW server.
 
+        All the records are kept in memory, use iter_csw_records to process them page by page.
+
         Args:
             typenames (str, optional): The typeNames to query against. Defaults to "csw:Record".
             limit (int, optional): The maximum number of records to return. No records are returned if 0. Defaults to None.
@@ -83,9 +306,97 @@ class HarvesterCSW(Harvester):
             page (int, optional): The number of records to return per page. Defaults to 30.
             startposition (int, optional): Requests a slice of the result set, starting at this position. Defaults to 0.
             sortproperty (str, optional): The sortProperty. Defaults to 'dc:identifier'.
+            workers (int, optional): The number of pages requested concurrently. Defaults to 1.
+            retries (int, optional): The number of retries of a failed page. Defaults to 0.
 
         Returns:
-            None
+            CatalogueServiceWeb: The CSW object with the records of all the pages.
+        """
+        records = OrderedDict(self.iter_csw_records(typenames, limit, esn, outputschema, page, startposition, sortproperty, workers, retries))
+        self.csw.records = records
+
+        return self.csw
+
+    def iter_csw_records(self, typenames="csw:Record", limit=None,
+                        esn="full", outputschema="http://www.isotc211.org/2005/gmd",
+                        page=30, startposition=0, sortproperty='dc:identifier',
+                        workers=1, retries=0, constraints=None, fallback_constraints=None):
+        """
+        Yields the records from a CSW server page by page, filtered by the constraint mails and organisations.
+
+        Args:
+            typenames (str, optional): The typeNames to query against. Defaults to "csw:Record".
+            limit (int, optional): The maximum number of records to return. No records are returned if 0. Defaults to None.
+            esn (str, optional): The ElementSetName 'full', 'brief' or 'summary'. Defaults to 'summary'.
+            outputschema (str, optional): The outputSchema. Defaults to 'http://www.opengis.net/cat/csw/2.0.2'.
+            page (int, optional): The number of records to return per page. Defaults to 30.
+            startposition (int, optional): Requests a slice of the result set, starting at this position. Defaults to 0.
+            sortproperty (str, optional): The sortProperty. Defaults to 'dc:identifier'.
+            workers (int, optional): The number of pages requested concurrently. Defaults to 1.
+            retries (int, optional): The number of retries of a failed page. Defaults to 0.
+            constraints (list, optional): The constraints of the request. Defaults to None (the constraint keywords, mails and organisations).
+            fallback_constraints (list, optional): The constraints of the request if the server rejects the constraints. Defaults to None.
+
+        Yields:
+            Tuple[str, MD_Metadata]: The identifier and the record, filtered by the constraint mails and organisations.
+        """
+        records_count = 0
+        records_matched = 0
+        for page_records in self.iter_csw_pages(typenames, limit, esn, outputschema, page, startposition, sortproperty, workers, retries, constraints, fallback_constraints):
+            for identifier, record in page_records.items():
+                if limit is not None and records_count >= limit:
+                    break
+                records_count += 1
+                if not self.match_constraints(record):
+                    continue
+                records_matched += 1
+                yield identifier, record
+
+        logging.info(f"{log_module}:CSW records matches with constraints: {records_matched}")
+
+    def match_constraints(self, record):
+        """
+        Whether an ISO record matches the constraint mails, and the constraint organisations if the server did not filter them.
+        """
+        return self.match_constraint_mails(record) and (self.constraint_pushdown or self.match_constraint_organisations(record))
+
+    def match_constraint_mails(self, record):
+        """
+        Whether the contact email of an ISO record is in constraints.mails, or there are no constraint mails.
+        """
+        # Filter in x.contact[0].email for existing elements in constraints.mails
+        return not self.constraint_mails or record.contact[0].email.lower().replace(' ','') in self.constraint_mails
+
+    def iter_csw_pages(self, typenames="csw:Record", limit=None,
+                        esn="full", outputschema="http://www.isotc211.org/2005/gmd",
+                        page=30, startposition=0, sortproperty='dc:identifier', sortorder='ASC',
+                        workers=1, retries=0, constraints=None, fallback_constraints=None):
+        """
+        Yields the GetRecords pages of a CSW server.
+
+        The first page returns the number of records matched, then the remaining pages are requested concurrently,
+        no more than 'workers' pages ahead of the records being processed, and yielded in order of their start position.
+        A failed page is retried on its own.
+
+        If the server rejects the constraints (e.g. an unsupported queryable), the request is sent again with the
+        fallback constraints and the records are filtered on the client instead.
+
+        Args:
+            typenames (str, optional): The typeNames to query against. Defaults to "csw:Record".
+            limit (int, optional): The maximum number of records to return. No records are returned if 0. Defaults to None.
+            esn (str, optional): The ElementSetName 'full', 'brief' or 'summary'. Defaults to 'summary'.
+            outputschema (str, optional): The outputSchema. Defaults to 'http://www.opengis.net/cat/csw/2.0.2'.
+            page (int, optional): The number of records to return per page. Defaults to 30.
+            startposition (int, optional): Requests a slice of the result set, starting at this position. Defaults to 0.
+            sortproperty (str, optional): The sortProperty. Defaults to 'dc:identifier'.
+            sortorder (str, optional): The sortOrder 'ASC' or 'DESC'. Defaults to 'ASC'.
+            workers (int, optional): The number of pages requested concurrently. Defaults to 1.
+            retries (int, optional): The number of retries of a failed page. Defaults to 0.
+            constraints (list, optional): The constraints of the request. Defaults to None (the constraint keywords, mails and organisations).
+            fallback_constraints (list, optional): The constraints of the request if the server rejects the constraints. Defaults to None (the constraint keywords).
+
+        Yields:
+            OrderedDict: The records of each page by identifier.
 
         Additional Information:
             getrecords2 (OWSLib): Construct and process a GetRecords request in order to retrieve metadata records from a CSW.
@@ -107,10 +418,16 @@ class HarvesterCSW(Harvester):
         """
         # Connect to OGC services
         csw = self.connect_csw()
-        csw.sortby = SortBy([SortProperty(sortproperty)])
+        csw.sortby = SortBy([SortProperty(sortproperty, sortorder)])
+        self.csw = csw
+
+        if constraints is None:
+            constraints = self.get_constraint_filter(self.constraint_keywords, *self.get_pushdown_constraints())
+            fallback_constraints = self.constraint_keywords if fallback_constraints is None else fallback_constraints
+        self.constraint_pushdown = True
 
         kwa = {
-            "constraints": self.constraint_keywords,
+            "constraints": constraints,
             "typenames": typenames,
             "esn": esn,
             "maxrecords": page,
@@ -131,43 +448,140 @@ class HarvesterCSW(Harvester):
 
         logging.info(f"{log_module}:Making CSW request: 'getrecords2()': {kwa_logg}")
 
-        i = 0
-        matches = 0
-        while True:
+        # First page
+        try:
             csw.getrecords2(**kwa)
-            if csw.exceptionreport:
-                err = f"Error getting identifiers: {csw.exceptionreport.exceptions}"
-                # log.error(err)
-                raise CswError(err)
+            rejected = csw.exceptionreport.exceptions if csw.exceptionreport else None
+        except (ExceptionReport, ServiceException) as e:
+            if fallback_constraints is None or fallback_constraints == constraints:
+                raise
+            rejected = e
+        if rejected and fallback_constraints is not None and fallback_constraints != constraints:
+            logging.warning(f"{log_module}:{self.name} (CSW) server rejected the mails/organisations constraints ({rejected}). Filtering the records on the client")
+            self.constraint_pushdown = False
+            kwa["constraints"] = fallback_constraints
+            csw.getrecords2(**kwa)
+        if csw.exceptionreport:
+            err = f"Error getting identifiers: {csw.exceptionreport.exceptions}"
+            raise CswError(err)
 
-            if matches == 0:
-                matches = csw.results['matches']
+        matches = csw.results['matches']
+        first_page_records = csw.records
+        csw.records = OrderedDict()
+        logging.info(f"{log_module}:Records avaliable in CSW Server: {matches}")
 
-            identifiers = list(csw.records.keys())[:(limit-startposition)] if limit is not None else csw.records.keys()
-            if not identifiers:
-                logging.info(f"{log_module}:Records avaliable in CSW Server: {csw.results['matches']}")
-                break
+        # Start positions of the remaining pages (CSW positions start at 1)
+        next_position = csw.results.get('nextrecord')
+        if next_position is None:
+            next_position = max(startposition, 1) + csw.results['returned']
+        last_position = matches if limit is None else min(matches, max(startposition, 1) + limit - 1)
+        positions = list(range(next_position, last_position + 1, page)) if next_position > 0 and csw.results['returned'] > 0 else []
 
-            i += len(identifiers)
-            if limit is not None and i > limit:
-                logging.info(f"{log_module}:Records avaliable in CSW Server: {csw.results['matches']}")
-                break
+        getrecords_url = self.get_operation_url(csw, 'GetRecords', 'post')
 
-            startposition += page
-            if startposition >= (matches + 1):
-                logging.info(f"{log_module}:Records avaliable in CSW Server: {csw.results['matches']}")
-                break
+        def get_page(csw_thread, position):
+            csw_thread.getrecords2(**{**kwa, "startposition": position})
 
-            kwa["startposition"] = startposition
+        if positions:
+            logging.info(f"{log_module}:Requesting {len(positions)} CSW pages of {page} records with {workers} workers")
 
-        # Filter in x.contact[0].email for existing elements in constraints.mails
-        if self.constraint_mails:
-            csw.records = {k: v for k, v in csw.records.items() if v.contact[0].email.lower().replace(' ','') in self.constraint_mails}
-        logging.info(f"{log_module}:CSW records matches with constraints: {len(csw.records)}")
+        yield first_page_records
+        yield from self.iter_csw_requests(getrecords_url, csw.timeout, get_page, positions, workers, retries)
+
+    def iter_csw_requests(self, url, timeout, request, args, workers=1, retries=0):
+        """
+        Sends CSW requests concurrently and yields their records in order of the arguments.
 
-        return csw
+        No more than 'workers' requests are sent ahead of the records being processed, and a failed request is retried on its own.
 
-    def get_dataset(self, ckan_info: CKANInfo, record: str, service_type: str):
+        Args:
+            url (str): The URL of the CSW operation.
+            timeout (int): The timeout of the requests.
+            request (Callable): Function that sends the request of an argument with a CatalogueServiceWeb.
+            args (list): The arguments of the requests (e.g. start positions or identifiers).
+            workers (int, optional): The number of requests sent concurrently. Defaults to 1.
+            retries (int, optional): The number of retries of a failed request. Defaults to 0.
+
+        Yields:
+            OrderedDict: The records of each request by identifier.
+        """
+        thread_data = threading.local()
+
+        def get_records(arg):
+            for attempt in range(retries + 1):
+                try:
+                    # OWSLib CSW objects keep the last response, so each thread uses its own.
+                    if not hasattr(thread_data, 'csw'):
+                        thread_data.csw = CatalogueServiceWeb(url, timeout=timeout, skip_caps=True)
+                    request(thread_data.csw, arg)
+                    if thread_data.csw.exceptionreport:
+                        raise CswError(f"Error getting records: {thread_data.csw.exceptionreport.exceptions}")
+                    records = thread_data.csw.records
+                    thread_data.csw.records = OrderedDict()
+                    return records
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    logging.warning(f"{log_module}:CSW request failed ({e}). Retry {attempt + 1}/{retries}")
+                    time.sleep(2 ** attempt)
+
+        with ThreadPoolExecutor(max_workers=max(min(workers, len(args)), 1), thread_name_prefix=f"csw-{self.name}") as executor:
+            pending_requests = deque()
+            pending_args = iter(args)
+            while True:
+                # Send the next requests while the records already received are processed.
+                while len(pending_requests) < max(workers, 1):
+                    arg = next(pending_args, None)
+                    if arg is None:
+                        break
+                    pending_requests.append(executor.submit(get_records, arg))
+
+                if not pending_requests:
+                    break
+                yield pending_requests.popleft().result()
+
+    def iter_csw_records_by_id(self, identifiers, esn="full", outputschema="http://www.isotc211.org/2005/gmd",
+                               batch_size=20, workers=1, retries=0):
+        """
+        Yields the records of a list of identifiers from a CSW server, requested concurrently in GetRecordById batches.
+
+        Args:
+            identifiers (list): The identifiers of the records.
+            esn (str, optional): The ElementSetName 'full', 'brief' or 'summary'. Defaults to 'full'.
+            outputschema (str, optional): The outputSchema. Defaults to 'http://www.isotc211.org/2005/gmd'.
+            batch_size (int, optional): The number of identifiers of each GetRecordById request. Defaults to 20.
+            workers (int, optional): The number of requests sent concurrently. Defaults to 1.
+            retries (int, optional): The number of retries of a failed request. Defaults to 0.
+
+        Yields:
+            Tuple[str, MD_Metadata]: The identifier and the record, filtered by the constraint mails and organisations.
+        """
+        if self.csw is None:
+            self.csw = self.connect_csw()
+        getrecordbyid_url = self.get_operation_url(self.csw, 'GetRecordById', 'get')
+        batches = [identifiers[i:i + batch_size] for i in range(0, len(identifiers), batch_size)]
+
+        def get_batch(csw_thread, batch):
+            csw_thread.getrecordbyid(id=batch, esn=esn, outputschema=outputschema)
+
+        if batches:
+            logging.info(f"{log_module}:Requesting {len(identifiers)} CSW records in {len(batches)} GetRecordById requests with {workers} workers")
+
+        records_matched = 0
+        records_missing = 0
+        for batch, batch_records in zip(batches, self.iter_csw_requests(getrecordbyid_url, self.csw.timeout, get_batch, batches, workers, retries)):
+            records_missing += len([i for i in batch if i not in batch_records])
+            for identifier, record in batch_records.items():
+                if not self.match_constraints(record):
+                    continue
+                records_matched += 1
+                yield identifier, record
+
+        if records_missing:
+            logging.warning(f"{log_module}:CSW records not returned by GetRecordById: {records_missing}")
+        logging.info(f"{log_module}:CSW records matches with constraints: {records_matched}")
+
+    def get_dataset(self, ckan_info: CKANInfo, record: str, service_type: str, layer_info=None):
         '''
         Gets a dataset from an CSW service.
 
@@ -175,6 +589,7 @@ class HarvesterCSW(Harvester):
             ckan_info (CKANInfo): CKANInfo object containing the CKAN URL and API key.
             record (str): identifier of the dataset to retrieve.
             service_type (str): Type of OGC service ('csw' for Catalog endpoints).
+            layer_info (MD_Metadata, optional): The CSW record. Defaults to None (self.csw.records[record]).
 
         Returns:
             Dataset: Dataset object.
@@ -184,7 +599,7 @@ class HarvesterCSW(Harvester):
             self.get_dataset_common_elements(record, ckan_info.ckan_dataset_schema)
 
         # Get CSW record info
-        if service_type == 'csw':
+        if service_type == 'csw' and layer_info is None:
             layer_info = self.csw.records[record]
         self.ows_update_metadata_sections(layer_info)
         layer_info.md_not_owslib = self.ows_get_metadata_not_owslib(layer_info)
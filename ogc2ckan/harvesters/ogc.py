@@ -1,8 +1,13 @@
 # inbuilt libraries
 from datetime import datetime
 from urllib.parse import urlencode
+import hashlib
+import logging
+import os
 
 # third-party libraries
+import requests
+from owslib.etree import etree
 from owslib.wms import WebMapService
 from owslib.wfs import WebFeatureService
 from owslib.wcs import WebCoverageService
@@ -15,8 +20,17 @@ from harvesters.base import Harvester
 from config.ckan_config import CKANInfo
 
 # custom functions
+from config.ogc2ckan_config import get_log_module
+from controller.pipeline import iter_concurrent
 from mappings.default_ogc2ckan_config import OGC2CKAN_HARVESTER_MD_CONFIG
 
+log_module = get_log_module(os.path.abspath(__file__))
+
+
+# Custom exceptions.
+class OGCError(Exception):
+    pass
+
 
 class HarvesterOGC(Harvester):
     def __init__(self, app_dir, url, name, groups, active, organization, type, custom_organization_active, custom_organization_mapping_file, private_datasets, default_keywords, default_inspire_info, ckan_name_not_uuid, workspaces, constraints=None, **default_dcat_info):
@@ -71,32 +85,204 @@ class HarvesterOGC(Harvester):
     def get_wmts_url(self):
         return self.wmts_url if self.wmts_url is not None else (self.url.replace('/ows', '/gwc') + '/service/wmts')
 
-    def connect_wms(self):
-        return WebMapService(self.get_wms_url())
+    def connect_wms(self, timeout=30, url=None):
+        return WebMapService(url or self.get_wms_url(), timeout=timeout)
 
-    def connect_wfs(self):
-        return WebFeatureService(self.get_wfs_url())
+    def connect_wfs(self, timeout=30, url=None):
+        return WebFeatureService(url or self.get_wfs_url(), timeout=timeout)
 
-    def connect_wcs(self):
-        return WebCoverageService(self.get_wcs_url())
+    def connect_wcs(self, timeout=30, url=None):
+        return WebCoverageService(url or self.get_wcs_url(), timeout=timeout)
 
-    def connect_wmts(self):
-        return WebMapTileService(self.get_wmts_url())
+    def connect_wmts(self, timeout=30, url=None):
+        return WebMapTileService(url or self.get_wmts_url(), timeout=timeout)
+
+    def get_source_fingerprint(self, ckan_info):
+        """
+        Returns the fingerprint of the OGC server: the 'updateSequence' of the WMS capabilities (GeoServer increases it
+        with every change of its catalog), or the hash of the WMS, WFS and WCS capabilities if the server has none.
+
+        The previous 'updateSequence' is sent in the request, so an unchanged server only returns a short exception.
+
+        Args:
+            ckan_info (CKANInfo): CKANInfo object with the OGC settings.
+
+        Returns:
+            str: The updateSequence or the hash of the capabilities.
+        """
+        update_sequence = self.get_harvest_state().get('update_sequence')
+        params = {'request': 'GetCapabilities'}
+        if update_sequence:
+            params['updatesequence'] = update_sequence
+        response = requests.get(self.get_wms_url(), params=params, timeout=ckan_info.ogc_capabilities_timeout)
+        response.raise_for_status()
+        root = etree.fromstring(response.content)
+
+        if update_sequence and any('CurrentUpdateSequence' in (e.get('code'), e.get('exceptionCode')) for e in root.iter()):
+            self.source_state = {'update_sequence': update_sequence}
+            return f"updateSequence:{update_sequence}"
+        if root.get('updateSequence'):
+            self.source_state = {'update_sequence': root.get('updateSequence')}
+            return f"updateSequence:{root.get('updateSequence')}"
+
+        capabilities_hash = hashlib.sha256(response.content)
+        for url in [self.get_wfs_url(), self.get_wcs_url()]:
+            response = requests.get(url, params={'request': 'GetCapabilities'}, timeout=ckan_info.ogc_capabilities_timeout)
+            capabilities_hash.update(response.content if response.ok else b'')
+
+        return f"sha256:{capabilities_hash.hexdigest()}"
+
+    def get_workspace_url(self, workspace):
+        """
+        Returns the URL of the GeoServer virtual services of a workspace ('.../geoserver/ows' -> '.../geoserver/{workspace}/ows'),
+        or None if the URL of the server is not an OWS endpoint.
+        """
+        url = self.url.rstrip('/')
+        if not url.endswith('/ows'):
+            return None
+
+        return f"{url[:-len('/ows')]}/{workspace}/ows"
+
+    def get_workspace_service_urls(self, workspace):
+        """
+        Returns the URLs of the WMS, WFS, WCS and WMTS virtual services of a GeoServer workspace.
+        """
+        workspace_url = self.get_workspace_url(workspace)
+
+        return {
+            'wms': workspace_url + '?service=wms',
+            'wfs': workspace_url + '?service=wfs',
+            'wcs': workspace_url + '?service=WCS',
+            'wmts': f"{workspace_url[:-len('/ows')]}/gwc/service/wmts"
+        }
+
+    @staticmethod
+    def set_workspace_prefix(service, service_type, workspace):
+        """
+        Adds the workspace prefix to the layers of a GeoServer virtual service that are listed without it,
+        so they have the same names as in the capabilities of the server.
+        """
+        separator = '__' if service_type == 'wcs' else ':'
+        service.contents = {
+            name if ':' in name or '__' in name else f"{workspace}{separator}{name}": layer
+            for name, layer in service.contents.items()
+        }
+
+    def get_ogc_services(self, timeout=30, workspaces=None, workers=4):
+        """
+        Downloads the capabilities of the WMS, WFS, WCS and WMTS services concurrently, from the server
+        or from the GeoServer virtual services of each workspace.
+
+        A service that fails (e.g. a server without WMTS) is left as None and its distributions are not added.
+
+        Args:
+            timeout (int, optional): The timeout in seconds of each capabilities request. Defaults to 30.
+            workspaces (list, optional): The workspaces of the virtual services. Defaults to None (the services of the server).
+            workers (int, optional): The number of capabilities requested concurrently. Defaults to 4.
+
+        Returns:
+            dict: The services by workspace (None for the server) and service type. Those without WFS or WCS service are not included.
+        """
+        connections = {
+            'wms': self.connect_wms,
+            'wfs': self.connect_wfs,
+            'wcs': self.connect_wcs,
+            'wmts': self.connect_wmts
+        }
+        scopes = workspaces or [None]
+        service_requests = [(scope, service_type) for scope in scopes for service_type in connections]
+
+        def connect(service_request):
+            scope, service_type = service_request
+            url = self.get_workspace_service_urls(scope)[service_type] if scope is not None else None
+            return connections[service_type](timeout, url)
+
+        services = {scope: dict.fromkeys(connections) for scope in scopes}
+        for (scope, service_type), service, e in iter_concurrent(connect, service_requests, max_in_flight=min(workers, len(service_requests)), name=f"ogc-{self.name}"):
+            scope_name = f"{self.name}/{scope}" if scope is not None else self.name
+            if e is not None:
+                logging.warning(f"{log_module}:{scope_name} ({service_type.upper()}) capabilities not available: {e}")
+                continue
+            if scope is not None:
+                self.set_workspace_prefix(service, service_type, scope)
+            services[scope][service_type] = service
+
+        available_services = {}
+        for scope, scope_services in services.items():
+            if scope_services['wfs'] is None and scope_services['wcs'] is None:
+                logging.warning(f"{log_module}:{f'{self.name}/{scope}' if scope is not None else self.name} has no WFS or WCS service available")
+                continue
+            available_services[scope] = scope_services
+
+        return available_services
+
+    def set_ogc_services(self, services):
+        self.wms = services['wms']
+        self.wfs = services['wfs']
+        self.wcs = services['wcs']
+        self.wmts = services['wmts']
+
+    def connect_ogc_services(self, timeout=30, workers=4):
+        """
+        Downloads the capabilities of the WMS, WFS, WCS and WMTS services of the server concurrently.
+
+        Args:
+            timeout (int, optional): The timeout in seconds of each capabilities request. Defaults to 30.
+            workers (int, optional): The number of capabilities requested concurrently. Defaults to 4.
+
+        Raises:
+            OGCError: If neither the WFS nor the WCS service is available, so there are no datasets to harvest.
+        """
+        services = self.get_ogc_services(timeout, workers=workers).get(None)
+        if services is None:
+            raise OGCError(f"{self.name} server has no WFS or WCS service available")
+        self.set_ogc_services(services)
+
+    @staticmethod
+    def get_service_contents(service):
+        """
+        Returns the layers of an OGC service, empty if the service is not available.
+        """
+        return service.contents if service is not None else {}
+
+    @staticmethod
+    def match_workspaces(layer_name, workspaces):
+        """
+        Whether the workspace of a layer ('workspace:layer') is one of the workspaces, or there are no workspaces.
+        """
+        return workspaces is None or layer_name.split(':')[0].lower() in [w.lower() for w in workspaces]
+
+    def iter_datasets(self, ckan_info):
+        timeout, workers = ckan_info.ogc_capabilities_timeout, ckan_info.ogc_capabilities_workers
+        workspaces = list(self.workspaces or [])
+
+        # Only request the layers of the selected workspaces, using the GeoServer virtual services of each workspace.
+        workspace_services = {}
+        if workspaces and self.get_workspace_url(workspaces[0]) is not None:
+            workspace_services = self.get_ogc_services(timeout, workspaces, workers)
+        for workspace, services in workspace_services.items():
+            self.set_ogc_services(services)
+            yield from self.iter_services_datasets(ckan_info, [workspace])
+
+        # The rest of the workspaces are selected from the services of the server.
+        server_workspaces = [w for w in workspaces if w not in workspace_services]
+        if not workspaces or server_workspaces:
+            if workspaces:
+                logging.info(f"{log_module}:{self.name} workspaces without virtual services, selected from the server capabilities: {', '.join(server_workspaces)}")
+            self.connect_ogc_services(timeout, workers)
+            yield from self.iter_services_datasets(ckan_info, server_workspaces or None)
+
+    def iter_services_datasets(self, ckan_info, workspaces=None):
+        """
+        Yields the datasets of the WCS and WFS layers of the current services, only those of the workspaces if any.
+        """
+        for record in self.get_service_contents(self.wcs):
+            if self.match_workspaces(record.replace("__", ":"), workspaces):
+                yield self.get_dataset(ckan_info, record, 'wcs')
+        for record in self.get_service_contents(self.wfs):
+            if self.match_workspaces(record, workspaces):
+                yield self.get_dataset(ckan_info, record, 'wfs')
 
-    def get_datasets(self, ckan_info):
-        # Connect to OGC services
-        self.wms = self.connect_wms()
-        self.wfs = self.connect_wfs()
-        self.wcs = self.connect_wcs()
-        self.wmts = self.connect_wmts()
-        
-        for record in self.wcs.contents:
-            self.datasets.append(self.get_dataset(ckan_info, record, 'wcs'))
-        for record in self.wfs.contents:
-            self.datasets.append(self.get_dataset(ckan_info, record, 'wfs'))
-                
-        return self.datasets
-        
     def get_dataset(self, ckan_info: CKANInfo, record: str, service_type: str):
         '''
         Gets a dataset from an OGC service. If the layer is also published as a WMS or WMTS layer, the distribution is also included.
@@ -117,13 +303,13 @@ class HarvesterOGC(Harvester):
         if service_type == 'wfs':
             layer_info = self.wfs.contents.get(record)
             wms_name = record
-            wms_layer_info = self.wms.contents.get(wms_name)
-            wmts_layer_info = self.wmts.contents.get(wms_name)
+            wms_layer_info = self.get_service_contents(self.wms).get(wms_name)
+            wmts_layer_info = self.get_service_contents(self.wmts).get(wms_name)
         elif service_type == 'wcs':
             layer_info = self.wcs.contents.get(record)
             wms_name = record.replace("__", ":")
-            wms_layer_info = self.wms.contents.get(wms_name)
-            wmts_layer_info = self.wmts.contents.get(wms_name)
+            wms_layer_info = self.get_service_contents(self.wms).get(wms_name)
+            wmts_layer_info = self.get_service_contents(self.wmts).get(wms_name)
 
         # Search if custom organization info exists for the dataset
         custom_metadata = None
@@ -165,6 +351,8 @@ class HarvesterOGC(Harvester):
         dataset.set_issued(issued_date)
         dataset.set_created(issued_date)
         dataset.set_modified(issued_date)
+        # The capabilities have no dates, the harvest date is not part of the content hash.
+        dataset.set_harvest_date_fields(['created', 'modified'])
 
         # DCAT Type (dataset/series)
         dcat_type = OGC2CKAN_HARVESTER_MD_CONFIG['dcat_type']
@@ -260,7 +448,7 @@ class HarvesterOGC(Harvester):
             self.set_default_responsible_parties(dataset, self.default_dcat_info, ckan_info)
 
         # Overwrite Point of contact (Metadata) and Responsible Party (Resource) from OGC Info
-        if self.wms.provider:
+        if self.wms is not None and self.wms.provider:
             contact_name = self.wms.provider.contact.name if self.wms.provider.contact.name is not None else self.wms.provider.contact.organization
             dataset.set_contact_name(contact_name)
             dataset.set_contact_email(self.wms.provider.contact.email.lower())
@@ -1,13 +1,20 @@
 # inbuilt libraries
 from datetime import datetime
+import functools
+import hashlib
+import itertools
+import json
 import os
 from pathlib import Path
 import logging
 import re
+import sqlite3
+import tempfile
 import uuid
 
 # third-party libraries
 import pandas as pd
+from pandas.io.parsers import TextParser
 import numpy as np
 import openpyxl
 import xlrd
@@ -48,86 +55,115 @@ class ObjectFromListDicts:
         return getattr(self, key, default)
 
 class HarvesterTable(Harvester):
+    # Formats harvested chunk by chunk (iter_table_data), the rest are loaded at once (get_file_by_extension).
+    CHUNKED_FORMATS = ['csv', 'tsv', 'parquet', 'feather', 'arrow']
+    COLUMNAR_FORMATS = ['parquet', 'feather', 'arrow']
+    # Columns read by the harvester that are not in the CKAN fields mapping.
+    TABLE_COLUMNS = ['table_type', 'dataset_id', 'author_email', 'conformance', 'purpose', 'set_spatial_resolution_in_meters']
+
     def __init__(self, app_dir, url, name, groups, active, organization, type, custom_organization_active, custom_organization_mapping_file, private_datasets, default_keywords, default_inspire_info, ckan_name_not_uuid, **default_dcat_info):
         super().__init__(app_dir, url, name, groups, active, organization, type, custom_organization_active, custom_organization_mapping_file, private_datasets, default_keywords, default_inspire_info, ckan_name_not_uuid, **default_dcat_info)
         self.file_extension = Path(self.url).suffix[1:]
         self.table_data = []
         self.datadictionaries = []
-        
-    def get_file_by_extension(self, harvester_formats):
+
+    def get_source_fingerprint(self, ckan_info):
+        '''
+        Gets the fingerprint of the table file: the SHA-256 checksum of its content and of its companion files.
+
+        Args:
+            ckan_info (CKANInfo): CKANInfo object containing the CKAN URL and API key.
+
+        Returns:
+            str: SHA-256 of the files.
+        '''
+        checksum = hashlib.sha256()
+        for path in [self.url] + [self._get_companion_file(table_type) for table_type in ['distribution', 'datadictionary']]:
+            if not os.path.isfile(path):
+                continue
+            checksum.update(os.path.basename(path).encode('utf-8'))
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    checksum.update(chunk)
+
+        return checksum.hexdigest()
+
+    def read_workbook(self, sheet_names, read_only_min_size=None):
+        '''
+        Reads the sheets of the workbook in a single pass, so the file is opened (and unzipped) only once.
+
+        The XLSX workbooks larger than read_only_min_size are read with openpyxl in read-only mode: the values of the
+        rows are streamed from the sheets without creating cell objects, and parsed with the same rules as
+        pd.read_excel(dtype=str).
+
+        Args:
+            sheet_names (list): The names of the sheets.
+            read_only_min_size (int, optional): Size in bytes of the workbooks read in read-only mode. Defaults to None (pandas).
+
+        Returns:
+            dict: The DataFrame of each sheet by name.
+        '''
+        if self.file_extension == 'xlsx' and read_only_min_size is not None and os.path.getsize(self.url) >= read_only_min_size:
+            workbook = openpyxl.load_workbook(self.url, read_only=True, data_only=True, keep_links=False)
+            try:
+                return {sheet_name: TextParser(self._get_sheet_rows(workbook[sheet_name]), header=0, dtype=str).read() for sheet_name in sheet_names}
+            finally:
+                workbook.close()
+
+        engine = 'openpyxl' if self.file_extension == 'xlsx' else None
+        return pd.read_excel(self.url, sheet_name=sheet_names, dtype=str, engine=engine)
+
+    def get_file_by_extension(self, harvester_formats, read_only_min_size=None):
         filename = os.path.basename(self.url)
         try:
             if self.file_extension in harvester_formats:
-                if self.file_extension in ['csv', 'tsv']:
-                    #TODO add support for other file formats
-                    raise Exception(f"Table file format: '{self.file_extension}' not supported yet")
-                    if self.file_extension == 'csv':
-                        table_data = pd.read_csv(self.url, sep=',', encoding='utf-8', dtype=str)
-                        table_distributions = table_data[table_data['table_type'] == 'distribution']
-                    elif self.file_extension == 'tsv':
-                        table_data = pd.read_csv(self.url, sep='\t', encoding='utf-8', dtype=str)
-                        table_distributions = table_data[table_data['table_type'] == 'distribution']
+                if self.file_extension in self.CHUNKED_FORMATS:
+                    # CSV/TSV and Parquet/Arrow files are harvested chunk by chunk (iter_table_data), here all the chunks are loaded.
+                    return [table_dataset for table_chunk in self.iter_table_data() for table_dataset in table_chunk]
                 elif self.file_extension in ['xls', 'xlsx']:
-                    engine = 'openpyxl' if self.file_extension == 'xlsx' else None
-                    table_data = pd.read_excel(self.url, sheet_name='Dataset', dtype=str, engine=engine).fillna('')
-                    table_distributions = pd.read_excel(self.url, sheet_name='Distribution', dtype=str, engine=engine).fillna('')
-                    table_datadictionaries = pd.read_excel(self.url, sheet_name='DataDictionary', dtype=str, engine=engine).fillna('')
+                    table_sheets = self.read_workbook(['Dataset', 'Distribution', 'DataDictionary'], read_only_min_size)
+                    table_data = table_sheets['Dataset'].fillna('')
+                    table_distributions = table_sheets['Distribution'].fillna('')
+                    table_datadictionaries = table_sheets['DataDictionary'].fillna('')
                                 
                 logging.info(f"{log_module}:Load '{self.file_extension.upper()}' file: '{filename}' with {len(table_data)} records") 
 
-                # Clean column names by removing leading/trailing whitespaces, newlines, and tabs
-                table_data.columns = table_data.columns.str.strip().str.replace('\n', '').str.replace('\t', '')
+                # Clean column names and values, remove all fields that are a nan float
+                table_data = self._clean_table_chunk(table_data)
+                table_distributions = self._clean_table_chunk(table_distributions)
+                table_datadictionaries = self._clean_table_chunk(table_datadictionaries)
 
-                # Remove all fields that are a nan float and trim all spaces of the values
-                table_data = table_data.apply(lambda x: x.str.strip() if x.dtype == 'object' else x)
-                table_data = table_data.fillna(value='')
-
-                # Convert table to list of dicts
-                table_data = table_data.to_dict('records')
-
-                # Select only the columns of type 'object' and apply the strip() method to them
-                table_distributions.loc[:, table_distributions.dtypes == object] = table_distributions.select_dtypes(include=['object']).apply(lambda x: x.str.strip())
-                table_datadictionaries.loc[:, table_datadictionaries.dtypes == object] = table_datadictionaries.select_dtypes(include=['object']).apply(lambda x: x.str.strip())
-                
                 # Remove prefixes from column names in the distributions/datadictionaries dataframe
-                table_distributions = table_distributions.rename(columns=lambda x: x.replace('resource_', ''))
-                table_datadictionaries = table_datadictionaries.rename(columns=lambda x: re.sub(re.compile(r'datadictionary(_info)?_'), '', x).replace('info.', ''))
+                table_distributions = self._rename_distribution_columns(table_distributions)
+                table_datadictionaries = self._rename_datadictionary_columns(table_datadictionaries)
 
-                # Remove rows where 'dataset_id' is None or an empty string
-                table_distributions = table_distributions[table_distributions['dataset_id'].notna() & (table_distributions['dataset_id'] != '')]
+                # Remove rows where 'dataset_id' is an empty string
+                table_distributions = table_distributions[table_distributions['dataset_id'] != '']
 
                 if not table_distributions.empty:
-                    # Group distributions by dataset_id and convert to list of dicts
-                    table_distributions_grouped = table_distributions.groupby('dataset_id' ).apply(lambda x: x.to_dict('records')).to_dict()
+                    # Split the list values and group distributions by dataset_id
+                    table_distributions = self._update_object_lists(table_distributions, quoted_lists=False)
+                    table_distributions_grouped = self._group_table_rows(table_distributions, 'dataset_id')
                 else:
                     logging.info(f"{log_module}:No distributions loaded. Check 'distribution.dataset_id' fields")
                     table_distributions_grouped = None
 
-                # Filter datadictionaries where resource_id is not empty or None
+                # Filter datadictionaries where resource_id is not empty
                 if 'resource_id' in table_datadictionaries.columns:
-                    table_datadictionaries = table_datadictionaries[table_datadictionaries['resource_id'].notna() & (table_datadictionaries['resource_id'] != '')]
+                    table_datadictionaries = table_datadictionaries[table_datadictionaries['resource_id'] != '']
 
-                    # Group datadictionaries by resource_id and convert to list of dicts
-                    table_datadictionaries_grouped = table_datadictionaries.groupby('resource_id').apply(lambda x: x.to_dict('records')).to_dict()
+                    # Group datadictionaries by resource_id
+                    table_datadictionaries_grouped = self._group_table_rows(table_datadictionaries, 'resource_id')
                 else:
                     logging.info(f"{log_module}:No datadictionaries loaded. Check 'datadictionary.resource_id' fields.")
                     table_datadictionaries_grouped = None
-                     
-                # Add distributions and datadictionaries to each dataset object
-                table_data = [
-                    {
-                        **d,
-                        'distributions': [
-                            {**dr, 'datadictionaries': table_datadictionaries_grouped.get(dr['id'], []) if table_datadictionaries_grouped else []}
-                            for dr in table_distributions_grouped.get(
-                                d.get('identifier') or d.get('alternate_identifier') or d.get('inspire_id'), []
-                            )
-                        ]
-                    }
-                    for d in table_data
-                ]
-
-                return table_data
+
+                # Split the list values of the datasets, the keys of the distributions are read first
+                table_keys = self._get_table_dataset_keys(table_data)
+                table_data = self._update_object_lists(table_data)
+
+                # Add distributions and datadictionaries to each dataset
+                return self._add_distributions(table_data, table_keys, table_distributions_grouped, table_datadictionaries_grouped)
 
             else:
                 raise Exception(f"Table file format: '{self.file_extension}' not supported")
@@ -135,18 +171,90 @@ class HarvesterTable(Harvester):
         except Exception as e:
             raise Exception(f"{log_module}:Failed to load the file:'{self.url}'", str(e))
 
-    def get_datasets(self, ckan_info):
+    def iter_table_data(self, chunk_size=None):
+        '''
+        Reads a CSV/TSV or Parquet/Arrow (Feather) file chunk by chunk, so the memory does not depend on the number of rows.
+
+        The distributions and data dictionaries are read from the companion files '{name}_distribution.{ext}' and
+        '{name}_datadictionary.{ext}', or from the rows of the file with 'table_type' 'distribution' and
+        'datadictionary' (the other rows are datasets). They are indexed first in a temporary SQLite database by
+        'dataset_id' and 'resource_id', and added to each chunk of datasets.
+
+        The Parquet/Arrow files are memory-mapped and only the columns of the CKAN fields mapping are read. The
+        Parquet row groups of other table types ('table_type' statistics) are skipped.
+
+        Args:
+            chunk_size (int, optional): Rows per chunk. Defaults to OGC2CKAN_HARVESTER_CONFIG['table']['chunk_size'].
+
+        Yields:
+            list: The datasets of each chunk (dicts with the list values split), with their distributions and data dictionaries.
+        '''
+        chunk_size = chunk_size or OGC2CKAN_HARVESTER_CONFIG['table']['chunk_size']
+        has_table_type = 'table_type' in self._get_table_columns(self.url)
+
+        with tempfile.TemporaryDirectory(prefix='ogc2ckan_table_') as tmp_folder:
+            connection = sqlite3.connect(os.path.join(tmp_folder, 'table_rows.sqlite'))
+            try:
+                connection.execute('CREATE TABLE rows (table_type TEXT NOT NULL, key TEXT NOT NULL, position INTEGER NOT NULL, row TEXT NOT NULL)')
+
+                # Index the distributions and data dictionaries, in the order of the files
+                positions = itertools.count()
+                for table_type, rename_columns, key in [('distribution', self._rename_distribution_columns, 'dataset_id'), ('datadictionary', self._rename_datadictionary_columns, 'resource_id')]:
+                    sources = [self.url] if has_table_type else []
+                    companion_file = self._get_companion_file(table_type)
+                    if os.path.isfile(companion_file):
+                        sources.append(companion_file)
+                    for source in sources:
+                        for table_chunk in self._read_table_chunks(source, chunk_size, [table_type] if source == self.url else None):
+                            table_chunk = self._clean_table_chunk(table_chunk)
+                            if source == self.url:
+                                table_chunk = table_chunk[table_chunk['table_type'].str.lower() == table_type]
+                            table_chunk = self._rename_prefixed_columns(table_chunk, rename_columns)
+                            if key not in table_chunk.columns:
+                                continue
+                            table_chunk = table_chunk[table_chunk[key] != '']
+                            if table_type == 'distribution':
+                                table_chunk = self._update_object_lists(table_chunk, quoted_lists=False)
+                            connection.executemany('INSERT INTO rows (table_type, key, position, row) VALUES (?, ?, ?, ?)', (
+                                (table_type, row[key], next(positions), json.dumps(row)) for row in table_chunk.to_dict('records')))
+                connection.execute('CREATE INDEX rows_key ON rows (table_type, key, position)')
+                connection.commit()
+
+                # Datasets, chunk by chunk
+                table_data_count = 0
+                for table_chunk in self._read_table_chunks(self.url, chunk_size, ['', 'dataset'] if has_table_type else None):
+                    table_chunk = self._clean_table_chunk(table_chunk)
+                    if has_table_type:
+                        table_chunk = table_chunk[table_chunk['table_type'].str.lower().isin(['', 'dataset'])]
+                    table_keys = self._get_table_dataset_keys(table_chunk)
+                    table_chunk = self._update_object_lists(table_chunk)
+                    table_distributions_grouped = self._get_indexed_rows(connection, 'distribution', table_keys.tolist())
+                    table_datadictionaries_grouped = self._get_indexed_rows(connection, 'datadictionary', [dr.get('id') for distributions in table_distributions_grouped.values() for dr in distributions])
+                    table_data_count += len(table_chunk)
+                    yield self._add_distributions(table_chunk, table_keys, table_distributions_grouped, table_datadictionaries_grouped)
+            finally:
+                connection.close()
+
+        logging.info(f"{log_module}:Load '{self.file_extension.upper()}' file: '{os.path.basename(self.url)}' with {table_data_count} records")
+
+    def iter_datasets(self, ckan_info):
+        if self.file_extension in self.CHUNKED_FORMATS:
+            # Datasets mapped chunk by chunk
+            for table_chunk in self.iter_table_data(ckan_info.table_chunk_size):
+                for table_dataset in table_chunk:
+                    table_dataset = ObjectFromListDicts(**table_dataset)
+                    yield self.get_dataset(ckan_info, table_dataset.title, table_dataset)
+            return
+
         harvester_formats = ckan_info.ckan_harvester['table']['formats']
-        # Get table data
-        self.table_data = self.get_file_by_extension(harvester_formats)
+        # Get table data, with the values with commas as lists
+        self.table_data = self.get_file_by_extension(harvester_formats, ckan_info.table_read_only_min_size)
         
-        # Update values with commas to lists of objects
-        self.table_data = self._update_object_lists(self.table_data)
+        # Convert list of dictionaries to list of objects
+        self.table_data = [ObjectFromListDicts(**d) for d in self.table_data]
 
         for table_dataset in self.table_data:
-            self.datasets.append(self.get_dataset(ckan_info, table_dataset.title, table_dataset))
-               
-        return self.datasets
+            yield self.get_dataset(ckan_info, table_dataset.title, table_dataset)
     
     def get_dataset(self, ckan_info: CKANInfo, record: str, table_dataset: object = None):
         '''
@@ -209,6 +317,8 @@ class HarvesterTable(Harvester):
         dataset.set_issued(issued_date)
         dataset.set_created(created_date)
         dataset.set_modified(modified_date)
+        # The dates filled with the harvest date are not part of the content hash.
+        dataset.set_harvest_date_fields([field for field, value in [('created', table_dataset.created), ('modified', table_dataset.modified)] if not self._normalize_date(value)])
 
         # DCAT Type (dataset/series)
         dcat_type = getattr(table_dataset, 'dcat_type', OGC2CKAN_HARVESTER_MD_CONFIG['representation_type']['default'])
@@ -446,6 +556,193 @@ class HarvesterTable(Harvester):
             logging.error(f"Error adding data dictionary {distribution_id}: {e}")
 
 
+    def _get_companion_file(self, table_type):
+        return f"{os.path.splitext(self.url)[0]}_{table_type}.{self.file_extension}"
+
+    def _get_table_columns(self, path):
+        '''
+        Returns the column names of a CSV/TSV or Parquet/Arrow file (cleaned as _clean_table_chunk).
+        '''
+        if self.file_extension in self.COLUMNAR_FORMATS:
+            columns = pd.Index(self._open_columnar_file(path)[1].names)
+        else:
+            columns = pd.read_csv(path, sep='\t' if self.file_extension == 'tsv' else ',', encoding='utf-8', dtype=str, nrows=0).columns
+        return columns.str.strip().str.replace('\n', '').str.replace('\t', '')
+
+    def _read_table_chunks(self, path, chunk_size, table_types=None):
+        '''
+        Reads a CSV/TSV file with pandas, or a Parquet/Arrow file with pyarrow, in chunks of rows (DataFrames of str).
+
+        Args:
+            path (str): The path of the file.
+            chunk_size (int): Rows per chunk.
+            table_types (list, optional): The 'table_type' of the rows to read. It is only a hint to skip the Parquet row
+                groups, the rows must be filtered by the caller. Defaults to None (all the rows).
+
+        Yields:
+            pd.DataFrame: The rows of each chunk.
+        '''
+        if self.file_extension not in self.COLUMNAR_FORMATS:
+            yield from pd.read_csv(path, sep='\t' if self.file_extension == 'tsv' else ',', encoding='utf-8', dtype=str, chunksize=chunk_size)
+            return
+
+        reader, schema = self._open_columnar_file(path)
+        table_columns = set(self._get_table_column_names())
+        columns = [c for c in schema.names if c.strip().replace('\n', '').replace('\t', '') in table_columns]
+
+        if self.file_extension == 'parquet':
+            row_groups = [i for i in range(reader.num_row_groups) if self._has_parquet_table_types(reader, i, table_types)]
+            batches = reader.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=columns) if row_groups else []
+        else:
+            batches = (reader.get_batch(i).select(columns) for i in range(reader.num_record_batches))
+
+        for batch in batches:
+            # Zero-copy slices of the record batches larger than the chunks (Arrow IPC)
+            for offset in range(0, batch.num_rows, chunk_size):
+                table_chunk = batch.slice(offset, chunk_size).to_pandas(integer_object_nulls=True)
+                # Values as str, as the CSV/TSV files and the workbooks are read (dtype=str)
+                yield table_chunk.apply(lambda x: x if pd.api.types.is_string_dtype(x) else x.astype(str).where(x.notna(), ''))
+
+    def _open_columnar_file(self, path):
+        '''
+        Opens a Parquet or Arrow IPC (Feather v2) file memory-mapped.
+
+        Returns:
+            tuple: The reader (pyarrow.parquet.ParquetFile or pyarrow.ipc.RecordBatchFileReader) and its Arrow schema.
+        '''
+        # pyarrow is optional, it is only needed to harvest Parquet/Arrow files.
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise Exception(f"{log_module}:The 'pyarrow' package is needed to read '{self.file_extension}' files. Install it with 'pip install pyarrow'")
+
+        if self.file_extension == 'parquet':
+            reader = pyarrow.parquet.ParquetFile(path, memory_map=True)
+            return reader, reader.schema_arrow
+
+        reader = pyarrow.ipc.open_file(pyarrow.memory_map(path, 'r'))
+        return reader, reader.schema
+
+    @staticmethod
+    def _has_parquet_table_types(parquet_file, row_group, table_types):
+        '''
+        Whether a Parquet row group may have rows of the table types, by the statistics of its 'table_type' column.
+        '''
+        if table_types is None or 'table_type' not in parquet_file.schema_arrow.names:
+            return True
+        column = parquet_file.metadata.row_group(row_group).column(parquet_file.schema_arrow.get_field_index('table_type'))
+        statistics = column.statistics
+        if statistics is None or not statistics.has_min_max or statistics.min != statistics.max or statistics.null_count:
+            return True
+        return str(statistics.min).strip().lower() in table_types
+
+    @staticmethod
+    def _clean_table_chunk(table_chunk):
+        '''
+        Cleans the column names and the values of a table (as the 'Dataset' sheet of the workbooks): whitespaces,
+        newlines and tabs of the column names, spaces of the values and empty values as ''.
+        '''
+        # Clean column names by removing leading/trailing whitespaces, newlines, and tabs
+        table_chunk.columns = table_chunk.columns.str.strip().str.replace('\n', '').str.replace('\t', '')
+        # Trim all spaces of the values (object columns in pandas 2, str columns in pandas 3)
+        table_chunk = table_chunk.apply(lambda x: x.str.strip() if pd.api.types.is_string_dtype(x) else x)
+        return table_chunk.fillna(value='')
+
+    @staticmethod
+    def _rename_distribution_columns(table_distributions):
+        return table_distributions.rename(columns=lambda x: x.replace('resource_', ''))
+
+    @staticmethod
+    def _rename_datadictionary_columns(table_datadictionaries):
+        return table_datadictionaries.rename(columns=lambda x: re.sub(re.compile(r'datadictionary(_info)?_'), '', x).replace('info.', ''))
+
+    @staticmethod
+    def _rename_prefixed_columns(table_chunk, rename_columns):
+        '''
+        Removes the prefixes of the columns ('resource_', 'datadictionary_'). If a column without prefix has the same
+        name (e.g. 'title' of the datasets in a file with 'table_type' rows), the prefixed column is kept.
+        '''
+        renamed_chunk = rename_columns(table_chunk)
+        renamed_columns = list(renamed_chunk.columns)
+        keep = [column != renamed or renamed_columns.count(renamed) == 1 for column, renamed in zip(table_chunk.columns, renamed_columns)]
+        return renamed_chunk.loc[:, keep]
+
+    @staticmethod
+    def _get_indexed_rows(connection, table_type, keys):
+        '''
+        Returns the rows of a type indexed by iter_table_data, grouped by key in the order of the file.
+        '''
+        keys = list(dict.fromkeys(k for k in keys if k))
+        rows_grouped = {}
+        # SQLite limits the number of parameters of a query.
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            for key, row in connection.execute(f"SELECT key, row FROM rows WHERE table_type = ? AND key IN ({', '.join('?' * len(batch))}) ORDER BY position", [table_type] + batch):
+                rows_grouped.setdefault(key, []).append(json.loads(row))
+        return rows_grouped
+
+    @staticmethod
+    def _get_table_dataset_keys(table_data):
+        '''
+        Returns the key of the distributions of each dataset: 'identifier', or 'alternate_identifier', or 'inspire_id'.
+        '''
+        table_keys = pd.Series('', index=table_data.index, dtype=object)
+        for column in ['inspire_id', 'alternate_identifier', 'identifier']:
+            if column in table_data.columns:
+                table_keys = table_data[column].where(table_data[column] != '', table_keys)
+        return table_keys
+
+    @staticmethod
+    def _group_table_rows(table, key):
+        '''
+        Groups the rows of a table (dicts) by the values of a column, in a single pass and in the order of the table.
+        '''
+        rows_grouped = {}
+        for row in table.to_dict('records'):
+            rows_grouped.setdefault(row[key], []).append(row)
+        return rows_grouped
+
+    @staticmethod
+    def _add_distributions(table_data, table_keys, table_distributions_grouped, table_datadictionaries_grouped):
+        '''
+        Converts the datasets to dicts and adds the distributions (by the key of the dataset) and their data
+        dictionaries (by the id of the distribution), with a lookup in the grouped rows.
+        '''
+        table_distributions_grouped = table_distributions_grouped or {}
+        table_datadictionaries_grouped = table_datadictionaries_grouped or {}
+        table_data = table_data.to_dict('records')
+        for d, table_key in zip(table_data, table_keys.tolist()):
+            d['distributions'] = [
+                {**dr, 'datadictionaries': table_datadictionaries_grouped.get(dr.get('id'), [])}
+                for dr in table_distributions_grouped.get(table_key, [])
+            ]
+        return table_data
+
+    @staticmethod
+    def _get_sheet_rows(worksheet):
+        '''
+        Reads the values of a read-only worksheet as pandas does (pandas.io.excel._openpyxl): integer numbers as int,
+        empty cells as '', and the trailing empty cells and rows removed.
+        '''
+        # The dimensions saved in the file may be wrong, read all the rows.
+        worksheet.reset_dimensions()
+        rows = []
+        last_row_with_data = -1
+        for row in worksheet.iter_rows(values_only=True):
+            row = ['' if v is None else int(v) if isinstance(v, float) and v.is_integer() else v for v in row]
+            while row and row[-1] == '':
+                row.pop()
+            if row:
+                last_row_with_data = len(rows)
+            rows.append(row)
+
+        rows = rows[:last_row_with_data + 1]
+        max_width = max((len(row) for row in rows), default=0)
+
+        return [row + [''] * (max_width - len(row)) for row in rows]
+
     @staticmethod
     def _update_custom_format(format, url=None, **args):
         """Update the custom format based on custom rules.
@@ -473,55 +770,72 @@ class HarvesterTable(Harvester):
         return format
 
     @staticmethod
-    def _update_object_lists(data):
+    @functools.lru_cache(maxsize=None)
+    def _get_ckan_fields():
         """
-        Updates the object lists in the given data by splitting list-like string values and converting the data to a list of objects.
-
-        Args:
-            data (list): The list of dictionaries to update.
-
-        Returns:
-            list: The updated list of objects.
+        Returns the CKAN fields mapping file ('new_metadata_field' and 'stored' fields), read once.
         """
-        # Read the CKAN fields mapping file and filter only the fields that contain 'List' in the 'stored' field
         if OGC2CKAN_CKANINFO_CONFIG['ckan_fields_json']:
             ckan_fields = get_df_mapping_json(OGC2CKAN_CKANINFO_CONFIG['ckan_fields_json'])
         else:
             ckan_fields = get_df_mapping_json()
-        ckan_fields_filtered = ckan_fields.loc[ckan_fields['stored'].str.contains('List'), 'new_metadata_field'].tolist()
-
-        # Iterate over each element in the data list
-        for element in data:
-            # Iterate over each key-value pair in the element dictionary
-            for key, value in element.items():
-                # Check if the key is in the filtered list
-                if key in ckan_fields_filtered:                  
-                    # if value is a string list between "" or "'" then remove the quotes
-                    if isinstance(value, str) and value.startswith('"') and value.endswith('"') and ',' in value:
-                        # Split all values inside ""
-                        value_str = re.findall(r'"[^"]+"', value)
-                        # Split the string and remove whitespace and starts - from each item
-                        element[key] = [x.strip('"').strip().lstrip('-').strip() for x in value_str]
-
-                    # Check if the value is a list-like string
-                    elif isinstance(value, str) and any([char in value for char in ',]']):
-                        # Split the string and remove whitespace from each item
-                        element[key] = [x.strip().lstrip('-').strip() for x in value.split(',')]
-
-                elif key == 'distributions':
-                    # Iterate over each distribution dictionary in the 'distributions' list
-                    for distribution in value:
-                        # Iterate over each key-value pair in the distribution dictionary
-                        for key_dist, value_dist in distribution.items():
-                            # Check if the key is in the filtered list
-                            if key_dist in ckan_fields_filtered:
-                                # Check if the value is a list-like string
-                                if isinstance(value_dist, str) and any([char in value_dist for char in ',]']):
-                                    # Split the string and remove whitespace from each item
-                                    distribution[key_dist] = [x.strip() for x in value_dist.split(',')]
+        return tuple(zip(ckan_fields['new_metadata_field'], ckan_fields['stored'].fillna('')))
 
-        # Convert list of dictionaries to list of objects
-        table_datasets = [ObjectFromListDicts(**d) for d in data]
+    @staticmethod
+    def _get_list_fields():
+        """
+        Returns the CKAN fields stored as lists ('List' in the 'stored' field of the CKAN fields mapping file).
+        """
+        return [field for field, stored in HarvesterTable._get_ckan_fields() if 'List' in stored]
+
+    @staticmethod
+    def _get_table_column_names():
+        """
+        Returns the columns read from the Parquet/Arrow files: the CKAN fields of the mapping file and HarvesterTable.TABLE_COLUMNS.
+        """
+        return [field for field, _ in HarvesterTable._get_ckan_fields()] + HarvesterTable.TABLE_COLUMNS
+
+    @staticmethod
+    def _update_object_lists(table, quoted_lists=True):
+        """
+        Updates the object lists in the given table by splitting the list-like string values of the list fields, with
+        vectorized string operations on the columns.
+
+        Args:
+            table (pd.DataFrame): The table to update (datasets or distributions).
+            quoted_lists (bool, optional): Whether the values between "" are lists of quoted items and the leading '-'
+                of the items are removed (datasets). Defaults to True.
+
+        Returns:
+            pd.DataFrame: The updated table, the list values as lists.
+        """
+        table = table.reset_index(drop=True)
+
+        for column in table.columns.intersection(HarvesterTable._get_list_fields()):
+            values = table[column]
+            if not (values.dtype == object or pd.api.types.is_string_dtype(values)):
+                continue
+
+            # Check if the value is a list-like string
+            is_list = values.str.contains(r'[,\]]', regex=True, na=False)
+            if not is_list.any():
+                continue
+
+            # if value is a string list between "" then split all values inside ""
+            if quoted_lists:
+                is_quoted = values.str.startswith('"', na=False) & values.str.endswith('"', na=False) & values.str.contains(',', regex=False, na=False)
+            else:
+                is_quoted = pd.Series(False, index=values.index)
+            items = pd.concat([
+                values[is_quoted].str.findall(r'"[^"]+"').explode().str.strip('"'),
+                values[is_list & ~is_quoted].str.split(',').explode()
+            ])
+
+            # Remove whitespace (and starts - of the datasets) from each item
+            items = items.str.strip()
+            if quoted_lists:
+                items = items.str.lstrip('-').str.strip()
+
+            table[column] = values.astype(object).mask(is_list, items.groupby(level=0, sort=False).agg(list))
 
-        # Return the updated data
-        return table_datasets
+        return table
@@ -1,12 +1,19 @@
 # inbuilt libraries
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
 import logging
+import multiprocessing
+import tarfile
 import uuid
 import os
+import zipfile
 
 # third-party libraries
 from owslib.fes import PropertyIsLike
 from owslib.iso import MD_Metadata
 from owslib.etree import etree
+from owslib.namespaces import Namespaces
 
 # custom classes
 from harvesters.base import Harvester
@@ -14,22 +21,112 @@ from harvesters.base import Harvester
 from config.ckan_config import CKANInfo
 
 # custom functions
+from controller import ckan_management
 from config.ogc2ckan_config import get_log_module
 from mappings.default_ogc2ckan_config import OGC2CKAN_HARVESTER_MD_CONFIG, OGC2CKAN_HARVESTER_CONFIG
 
 log_module = get_log_module(os.path.abspath(__file__))
 
+# ISO 19139 records in the XML files (single records, GetRecords responses, etc.)
+ISO_METADATA_TAGS = [f"{{{Namespaces().get_namespace('gmd')}}}MD_Metadata", f"{{{Namespaces().get_namespace('gmi')}}}MI_Metadata"]
+
 
 # Custom exceptions.
 class XmlError(Exception):
     pass
 
+
+def get_metadata_record(md_element):
+    """Get an MD_Metadata object from an ISO 19139 element, without its XML tree.
+
+    The values not retrieved by OWSLib are extracted here and the XML tree is released, so the record is compact and
+    can be sent back from a worker process.
+
+    Args:
+        md_element (etree.Element): The gmd:MD_Metadata element.
+
+    Returns:
+        MD_Metadata: The metadata record.
+    """
+    metadata = MD_Metadata(md_element)
+    metadata.md_not_owslib = Harvester._ows_get_metadata_not_owslib(metadata, Harvester._ows_get_namespaces())
+    metadata.md = None
+    metadata.xml = None
+    return metadata
+
+def iter_metadata_elements(source):
+    """Yield the ISO 19139 records of an XML file, one or many (e.g. a GetRecords response dump).
+
+    The file is read with iterparse and each record is cleared once processed, so the memory does not depend on
+    the size of the file.
+
+    Args:
+        source (str or file): Path or file object of the XML file.
+
+    Yields:
+        MD_Metadata: The metadata records, in the order of the file.
+    """
+    for _, md_element in etree.iterparse(source, events=('end',), tag=ISO_METADATA_TAGS, resolve_entities=False):
+        yield get_metadata_record(md_element)
+        md_element.clear()
+        # Remove the records already processed from the parent element.
+        while md_element.getprevious() is not None:
+            del md_element.getparent()[0]
+
+def iter_archive_members(archive_path, md_formats):
+    """Yield the XML files of a zip or tar archive (compressed or not) without extracting them to disk.
+
+    Args:
+        archive_path (str): Path of the archive.
+        md_formats (tuple): Extensions of the XML files.
+
+    Yields:
+        tuple: The name and file object of each XML file, in the order of the archive.
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and member.filename.endswith(md_formats):
+                    with archive.open(member) as md_file:
+                        yield member.filename, md_file
+    else:
+        # Stream mode, the members are decompressed in order and read once.
+        with tarfile.open(archive_path, mode='r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith(md_formats):
+                    yield member.name, archive.extractfile(member)
+
+def parse_metadata_file(md_file_path):
+    """Parse an ISO 19139 metadata file, in a worker process of HarvesterXML.get_metadata_records.
+
+    Args:
+        md_file_path (str): Path of the metadata file.
+
+    Returns:
+        tuple: The MD_Metadata objects without their XML tree, and the parsing error (or None).
+    """
+    try:
+        return list(iter_metadata_elements(md_file_path)), None
+    except Exception as e:
+        return [], str(e)
+
 class HarvesterXML(Harvester):
     def __init__(self, app_dir, url, name, groups, active, organization, type, custom_organization_active, custom_organization_mapping_file, private_datasets, default_keywords, default_inspire_info, ckan_name_not_uuid, constraints, **default_dcat_info):
         super().__init__(app_dir, url, name, groups, active, organization, type, custom_organization_active, custom_organization_mapping_file, private_datasets, default_keywords, default_inspire_info, ckan_name_not_uuid, **default_dcat_info)
         self.md_records = None
+        # Manifest of the metadata files (XML_INCREMENTAL_MODE) and inspireId of the datasets by identifier
+        self.md_manifest = None
+        self.md_previous_manifest = {}
+        self.md_file_keys = set()
+        self.md_changed_files = {}
+        self.md_inspire_ids = {}
+        # Datasets of the new or modified files (XML_INCREMENTAL_MODE), their content hash is saved in the manifest.
+        self.md_changed_datasets = {}
         self.folder_path = None
         self.formats = OGC2CKAN_HARVESTER_CONFIG['xml']['formats']
+        self.archive_formats = OGC2CKAN_HARVESTER_CONFIG['xml']['archive_formats']
+        # Files and archives streamed record by record (get_metadata_records)
+        self.md_stream_paths = []
         self.constraint_keywords = self.set_constraint_keywords(constraints)
         self.constraint_mails = self.set_constraint_mails(constraints)
 
@@ -42,46 +139,258 @@ class HarvesterXML(Harvester):
     def set_constraint_mails(self, constraints):
         return [mail.lower().replace(' ','') for mail in constraints["mails"]]
     
-    def get_datasets(self, ckan_info):
-        self.md_records = self.get_metadata_records()
+    def iter_datasets(self, ckan_info):
+        self.md_records = self.get_metadata_records(ckan_info.xml_parse_workers, ckan_info.xml_incremental_mode, ckan_info.xml_stream_min_size)
 
         for record in self.md_records:
-            self.datasets.append(self.get_dataset(ckan_info, record, 'xml'))
+            dataset = self.get_dataset(ckan_info, record, 'xml')
+            self.md_inspire_ids[record] = dataset.inspire_id
+            if ckan_info.xml_incremental_mode:
+                self.md_changed_datasets[record] = dataset
+            yield dataset
+
+        # Large files and archives: each record is mapped as soon as it is parsed, and then released.
+        for layer_info in self.iter_stream_records():
+            dataset = self.get_dataset(ckan_info, layer_info.identifier, 'xml', layer_info)
+            self.md_inspire_ids[layer_info.identifier] = dataset.inspire_id
+            if ckan_info.xml_incremental_mode:
+                self.md_changed_datasets[layer_info.identifier] = dataset
+            yield dataset
+
+    def get_upsert_mode(self, ckan_info):
+        # The datasets of the modified files already exist in CKAN, without upsert they would be reported as conflicts and never updated.
+        if ckan_info.xml_incremental_mode and not ckan_info.upsert_mode:
+            logging.warning(f"{log_module}:{self.name} ({self.type.upper()}) XML_INCREMENTAL_MODE=True updates the modified datasets, enabling CKAN_UPSERT_MODE for this server")
+            return True
+        return super().get_upsert_mode(ckan_info)
+
+    def create_datasets(self, ckan_info):
+        super().create_datasets(ckan_info)
+
+        # Only the files whose dataset has been published (or already exists in CKAN) are kept in the manifest,
+        # the rest are parsed again in the next run.
+        if ckan_info.xml_incremental_mode and self.md_manifest is not None:
+            failed_inspire_ids = {e.get('inspire_id') for e in self.ckan_dataset_errors if not ckan_management.is_ckan_dataset_conflict(e)}
+            md_manifest = {}
+            for key in self.md_file_keys:
+                # Files not parsed (errors) or with failed datasets keep the entry of the last harvest.
+                entry = self.md_manifest.get(key)
+                if entry is None or any(self.md_inspire_ids.get(i) in failed_inspire_ids for i in entry['identifiers']):
+                    entry = self.md_previous_manifest.get(key)
+                elif any(i in self.md_changed_datasets for i in entry['identifiers']):
+                    # Content hash of the datasets published from the file, by identifier.
+                    entry = {**entry, 'published_hashes': {i: self.md_changed_datasets[i].content_hash for i in entry['identifiers'] if i in self.md_changed_datasets}}
+                if entry is not None:
+                    md_manifest[key] = entry
+            self.save_harvest_state(files=md_manifest)
+        self.md_changed_datasets = {}
+
+    def get_source_fingerprint(self, ckan_info):
+        """Get the fingerprint of the metadata files: path, size and modification time of each file.
 
-        return self.datasets
-    
-    def get_metadata_records(self):
+        Args:
+            ckan_info (CKANInfo): CKANInfo object containing the CKAN URL and API key.
+
+        Returns:
+            str: SHA-256 of the list of files.
+        """
+        md_files = [[self.get_manifest_key(path), size, mtime_ns] for path, (size, mtime_ns) in self.scan_metadata_files().items()]
+
+        return hashlib.sha256(json.dumps(sorted(md_files)).encode('utf-8')).hexdigest()
+
+    def scan_metadata_files(self):
+        """Get the metadata files: the file of the harvest server, or the files of its folder (and subfolders) with the XML formats.
+
+        The folder is read with a single os.scandir traversal, and the size and modification time of each file are
+        taken from the directory entries.
+
+        Returns:
+            dict: The size and modification time (ns) of the metadata files by path.
+        """
+        if os.path.isfile(self.url):
+            stat = os.stat(self.url)
+            return {self.url: (stat.st_size, stat.st_mtime_ns)}
+
+        md_files = {}
+        md_formats = tuple(self.formats + self.archive_formats)
+        folders = [self.url]
+        while folders:
+            folder = folders.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            folders.append(entry.path)
+                        elif entry.name.endswith(md_formats) and entry.is_file():
+                            stat = entry.stat()
+                            md_files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError as e:
+                logging.error(f"{log_module}:Error retrieving metadata records from folder: '{folder}': {e}")
+
+        return md_files
+
+    def get_metadata_file_paths(self):
+        """Get the paths of the metadata files: the file of the harvest server, or the files of its folder with the XML and archive formats.
+
+        Returns:
+            list: The paths of the metadata files.
+        """
+        return list(self.scan_metadata_files())
+
+    def get_manifest_key(self, md_file_path):
+        """Get the key of a metadata file in the manifest: its path relative to the folder of the harvest server.
+        """
+        return os.path.relpath(md_file_path, self.url if os.path.isdir(self.url) else os.path.dirname(self.url))
+
+    @staticmethod
+    def get_file_hash(md_file_path):
+        """Get the SHA-256 of the content of a file.
+        """
+        file_hash = hashlib.sha256()
+        with open(md_file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                file_hash.update(chunk)
+
+        return file_hash.hexdigest()
+
+    def get_changed_metadata_files(self, md_files):
+        """Compare the metadata files with the manifest of the last harvest (path, size, modification time, SHA-256,
+        identifiers and content hash of the datasets published), and report the records of the files removed since then.
+
+        A file is unchanged if its size and modification time are the same, or its content has the same SHA-256.
+
+        Args:
+            md_files (dict): The size and modification time (ns) of the metadata files by path.
+
+        Returns:
+            tuple: The paths of the files added or modified, and their manifest entries by path.
+        """
+        previous_manifest = self.md_previous_manifest = self.get_harvest_state().get('files') or {}
+        self.md_manifest = {}
+        changed_files = {}
+
+        for md_file_path in sorted(md_files):
+            size, mtime_ns = md_files[md_file_path]
+            key = self.get_manifest_key(md_file_path)
+            entry = previous_manifest.get(key)
+            if entry is not None and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+                self.md_manifest[key] = entry
+                continue
+
+            file_hash = self.get_file_hash(md_file_path)
+            if entry is not None and entry['sha256'] == file_hash:
+                self.md_manifest[key] = {**entry, 'size': size, 'mtime_ns': mtime_ns}
+                continue
+
+            changed_files[md_file_path] = {'size': size, 'mtime_ns': mtime_ns, 'sha256': file_hash, 'identifiers': []}
+
+        self.source_removed_records = sorted({i for key, entry in previous_manifest.items() if key not in self.md_file_keys for i in entry['identifiers']})
+        if self.source_removed_records:
+            logging.warning(f"{log_module}:{self.name} (XML) records of files removed since the last harvest: {', '.join(self.source_removed_records)}")
+
+        logging.info(f"{log_module}:{self.name} (XML) metadata files: {len(md_files)}, new or modified: {len(changed_files)}")
+
+        return list(changed_files), changed_files
+
+    def get_metadata_records(self, workers=1, incremental=False, stream_min_size=None):
         """Get metadata records and return them in a dictionary with the identifier as the key.
 
+        The files are parsed by a pool of processes, in the order of their paths, so the records (and the record
+        kept if several files have the same identifier) do not depend on the number of workers.
+
+        The archives and the files larger than stream_min_size are not parsed here, they are streamed record by
+        record by iter_stream_records.
+
+        Args:
+            workers (int, optional): The number of processes parsing the files, 0 is the number of CPUs. Defaults to 1.
+            incremental (bool, optional): Only parse the files added or modified since the last harvest (XML_INCREMENTAL_MODE). Defaults to False.
+            stream_min_size (int, optional): Size in bytes of the files streamed record by record. Defaults to None (only the archives).
+
         Returns:
             dict: A dictionary of MD_Metadata objects with the identifier as the key.
         """
         md_records = {}
-        md_file_paths = []
-        
-        if os.path.isfile(self.url):
-            md_file_paths.extend([self.url])
+        md_files = self.scan_metadata_files()
+        self.md_file_keys = {self.get_manifest_key(path) for path in md_files}
+        if incremental:
+            md_file_paths, changed_files = self.get_changed_metadata_files(md_files)
         else:
-            for md_format in self.formats:
-                try:
-                    md_file_paths.extend([os.path.join(root, file) for root, dirs, files in os.walk(self.url) for file in files if file.endswith(md_format)])
-                except XmlError as e:
-                    logging.error(f"{log_module}:Error retrieving metadata records from folder: '{self.url}': {e}")
-        
-        for md_record in md_file_paths:
-            try:
-                metadata = MD_Metadata(etree.parse(md_record))
-                identifier = metadata.identifier
-                #TODO: Multilang also for CSW and OGC harvesters
-                #metadata.locales = ['es', 'en']
-                if identifier:
-                    md_records[identifier] = metadata
-            except XmlError as e:
-                logging.error(f"{log_module}:Error adding loading MD_Metadata record: '{md_record}': {e}")
-                
+            md_file_paths, changed_files = sorted(md_files), {}
+
+        self.md_changed_files = changed_files
+        self.md_stream_paths = [path for path in md_file_paths if path.endswith(tuple(self.archive_formats)) or (stream_min_size is not None and md_files[path][0] >= stream_min_size)]
+        md_file_paths = [path for path in md_file_paths if path not in self.md_stream_paths]
+        if not workers:
+            # 0 is the number of CPUs, except in the harvest worker processes (PARALLELIZATION=True), which already use them.
+            workers = 1 if multiprocessing.parent_process() is not None else os.cpu_count() or 1
+        workers = min(workers, len(md_file_paths))
+
+        if workers > 1:
+            logging.info(f"{log_module}:Parsing {len(md_file_paths)} metadata files with {workers} processes")
+            # Spawned processes, the harvester may run in a thread (STREAMING_MODE) and forking a multithreaded process can deadlock.
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                # Chunks of files per task, the files are small and the results are returned in order.
+                chunksize = max(1, min(64, len(md_file_paths) // (workers * 4)))
+                results = list(executor.map(parse_metadata_file, md_file_paths, chunksize=chunksize))
+        else:
+            results = map(parse_metadata_file, md_file_paths)
+
+        for md_record, (md_file_records, error) in zip(md_file_paths, results):
+            if error is not None:
+                logging.error(f"{log_module}:Error adding loading MD_Metadata record: '{md_record}': {error}")
+                continue
+            identifiers = [metadata.identifier for metadata in md_file_records if metadata.identifier]
+            if md_record in changed_files:
+                self.md_manifest[self.get_manifest_key(md_record)] = {**changed_files[md_record], 'identifiers': identifiers}
+            #TODO: Multilang also for CSW and OGC harvesters
+            #metadata.locales = ['es', 'en']
+            for metadata in md_file_records:
+                if metadata.identifier:
+                    md_records[metadata.identifier] = metadata
+
         return md_records
 
-    def get_dataset(self, ckan_info: CKANInfo, record: str, service_type: str):
+    def iter_stream_records(self):
+        """Yield the records of the large files and archives selected by get_metadata_records, one by one.
+
+        The records are read with iterparse, and the members of the archives are read without extracting them, so
+        the memory does not depend on the size of the files. The records with the identifier of a record already
+        harvested are skipped.
+
+        Yields:
+            MD_Metadata: The metadata records, in the order of the files.
+        """
+        md_formats = tuple(self.formats)
+        harvested = set(self.md_records or {})
+
+        for md_stream_path in self.md_stream_paths:
+            logging.info(f"{log_module}:{self.name} (XML) streaming metadata records from: '{md_stream_path}'")
+            identifiers = []
+            try:
+                if md_stream_path.endswith(tuple(self.archive_formats)):
+                    sources = iter_archive_members(md_stream_path, md_formats)
+                else:
+                    sources = [(md_stream_path, md_stream_path)]
+
+                for source_name, source in sources:
+                    for metadata in iter_metadata_elements(source):
+                        if not metadata.identifier:
+                            continue
+                        if metadata.identifier in harvested:
+                            logging.warning(f"{log_module}:{self.name} (XML) record '{metadata.identifier}' of '{source_name}' already harvested, skipping it")
+                            continue
+                        harvested.add(metadata.identifier)
+                        identifiers.append(metadata.identifier)
+                        yield metadata
+
+            except Exception as e:
+                logging.error(f"{log_module}:Error streaming MD_Metadata records: '{md_stream_path}': {e}")
+                continue
+
+            if md_stream_path in self.md_changed_files:
+                self.md_manifest[self.get_manifest_key(md_stream_path)] = {**self.md_changed_files[md_stream_path], 'identifiers': identifiers}
+
+    def get_dataset(self, ckan_info: CKANInfo, record: str, service_type: str, layer_info=None):
         '''
         Gets a dataset from an XML metadata file (MD_Metadata OWSLib class).
 
@@ -89,6 +398,7 @@ class HarvesterXML(Harvester):
             ckan_info (CKANInfo): CKANInfo object containing the CKAN URL and API key.
             record (str): identifier of the dataset to retrieve.
             service_type (str): Type of OGC service ('csw' for Catalog endpoints).
+            layer_info (MD_Metadata, optional): The metadata record, if it is not in md_records (streamed records). Defaults to None.
 
         Returns:
             Dataset: Dataset object.
@@ -98,11 +408,13 @@ class HarvesterXML(Harvester):
             self.get_dataset_common_elements(record, ckan_info.ckan_dataset_schema)
 
         # Get metadata record info
-        if service_type == 'xml':
+        if service_type == 'xml' and layer_info is None:
             layer_info = self.md_records[record]
             
         self.ows_update_metadata_sections(layer_info)
-        layer_info.md_not_owslib = self.ows_get_metadata_not_owslib(layer_info)
+        # The records parsed by get_metadata_records already have the values not retrieved by OWSLib, without the XML tree.
+        if layer_info.md is not None:
+            layer_info.md_not_owslib = self.ows_get_metadata_not_owslib(layer_info)
 
         # Search if custom organization info exists for the dataset
         custom_metadata = None
@@ -3,7 +3,8 @@
 OGC2CKAN_PATHS_CONFIG = {
     'default_localized_strings_file': 'default_localized_strings.yaml',
     'default_languages_yaml': 'languages.yaml',
-    'default_mappings_folder': 'ogc2ckan/mappings'
+    'default_mappings_folder': 'ogc2ckan/mappings',
+    'default_state_folder': 'metadata/.ogc2ckan'
 }
 
 # Harvesters develop for this project. ogc2ckan/harvesters/harvesters.py
@@ -12,25 +13,46 @@ OGC2CKAN_HARVESTER_CONFIG = {
         'type': 'csw',
         'active': True,
         'keywords': ['csw', 'catalog'],
-        'formats': ['csw']
+        'formats': ['csw'],
+        'page_size': 30,
+        'page_workers': 4,
+        'page_retries': 3,
+        'incremental_mode': False,
+        'full_harvest_days': 7,
+        'two_phase_mode': False,
+        'list_page_size': 500,
+        'records_batch_size': 20
     },
     'ogc_server': {
         'type': 'ogc',
         'active': True,
         'keywords': ['ows', 'geoserver', 'mapserver', 'ogc'],
-        'formats': ['wfs', 'wcs', 'wms', 'wmts']
+        'formats': ['wfs', 'wcs', 'wms', 'wmts'],
+        'capabilities_timeout': 120,
+        'capabilities_workers': 8
     },
     'table': {
         'type': 'table',
         'active': True,
         'keywords': ['xls', 'csv'],
-        'formats': ['csv', 'xls', 'xlsx', 'tsv']
+        'formats': ['csv', 'xls', 'xlsx', 'tsv', 'parquet', 'feather', 'arrow'],
+        # Size in MB of the XLSX workbooks read with openpyxl in read-only mode
+        'read_only_min_size': 10,
+        # Rows per chunk of the CSV/TSV and Parquet/Arrow files
+        'chunk_size': 5000
     },
     'xml': {
         'type': 'xml',
         'active': True,
         'keywords': ['xml', 'iso', 'gmd', 'inspire'],
-        'formats': ['xml']
+        'formats': ['xml'],
+        # Archives of XML files, read without extracting them
+        'archive_formats': ['zip', 'tar', 'tar.gz', 'tgz'],
+        # Size in MB of the XML files streamed record by record (e.g. GetRecords response dumps)
+        'stream_min_size': 50,
+        # Processes parsing the metadata files, 0 is the number of CPUs (1 in the harvest worker processes)
+        'parse_workers': 1,
+        'incremental_mode': False
     },
 }
 
@@ -45,6 +67,39 @@ OGC2CKAN_CKAN_API_ROUTES = {
     'get_ckan_datasets_list': '/api/3/action/package_search?fl={fields}&rows={rows}&include_private={include_private}',
     'get_ckan_datasets_list_paginate': '/api/3/action/package_search?fl={fields}&rows={rows}&start={start}&include_private={include_private}',
     'get_ckan_dataset_info': '/api/3/action/package_search?q={field}:"{field_value}"',
+    'search_ckan_datasets': '/api/3/action/package_search',
+}
+
+# Index of the existing CKAN datasets. ogc2ckan/controller/ckan_management.py
+OGC2CKAN_CKAN_INDEX_CONFIG = {
+    'rows': 1000,
+    'workers': 4,
+    # First characters of the dataset ids (UUIDs or names) used to split the index in ranges retrieved concurrently.
+    'id_boundaries': list('0123456789abcdefghijklmnopqrstuvwxyz'),
+    'persistent': False,
+    'full_refresh_days': 7,
+}
+
+# CKAN API HTTP transport. ogc2ckan/controller/http_transport.py
+OGC2CKAN_HTTP_CONFIG = {
+    'connect_timeout': 10,
+    'read_timeout': 120,
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'pool_maxsize': 10,
+    'num_pools': 10,
+    'gzip_requests': False,
+    'gzip_min_size': 1024,
+}
+
+# Disk cache of the OGC services responses (OWSLib). ogc2ckan/controller/http_cache.py
+OGC2CKAN_HTTP_CACHE_CONFIG = {
+    'enabled': False,
+    'folder': 'http_cache',
+    'ttl': 0,
+    # MB
+    'max_size': 1024,
+    'max_age_days': 30,
 }
 
 # CKANInfo class default configuration
@@ -56,6 +111,14 @@ OGC2CKAN_CKANINFO_CONFIG = {
     'default_license': 'http://creativecommons.org/licenses/by/4.0/',
     'default_license_id': 'cc-by',
     'parallelization': False,
+    'parallelization_workers': None,
+    'streaming_mode': False,
+    'streaming_queue_size': 100,
+    'publish_workers': 1,
+    'publish_rate_limit': None,
+    'upsert_mode': False,
+    'ckan_index_scope': 'portal',
+    'skip_unchanged_sources': False,
     'ssl_unverified_mode': False,
     'dir3_url': 'http://datos.gob.es/es/recurso/sector-publico/org/Organismo',
     'ckan_dataset_schema': 'geodcatap-eu',
@@ -91,6 +91,7 @@ class HarvesterSchemaCSW(HarvesterSchema):
                 "properties": {
                     "keywords": {"type": "array"},
                     "mails": {"type": "array"},
+                    "organisations": {"type": "array"},
                     "inspireid_versionid": {"type": "string"}
                 },
                 "required": ["keywords", "mails"]
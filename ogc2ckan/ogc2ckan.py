@@ -2,17 +2,18 @@
 import logging
 from datetime import datetime   
 import os
-from joblib import Parallel, delayed
+from concurrent.futures import ProcessPoolExecutor
 import ssl
 import json
 
 # custom classes
 from controller import ckan_management
+from controller.http_cache import get_http_cache
 
 # custom functions
 from model.harvest_schema import validate_config_file
 from config.ckan_config import config_getParameters, config_getConnection
-from config.log import log_file
+from config.log import log_file, log_worker_file, get_log_filename
 from mappings.default_ogc2ckan_config import OGC2CKAN_HARVESTER_CONFIG
 
 # debug
@@ -45,8 +46,18 @@ def launch_harvest(harvest_server=None, ckan_info=None):
 
     harvester = Harvester.from_harvest_server(harvest_server, APP_DIR)
 
+    # Disk cache of the OWSLib requests (HTTP_CACHE=True)
+    http_cache = get_http_cache()
+    http_cache_stats = http_cache.get_stats() if http_cache is not None else None
+
     try:
         harvester.create_datasets(ckan_info)
+        if harvester.harvest_status != 'unchanged':
+            harvester.harvest_status = 'completed'
+
+        if http_cache is not None:
+            harvester.http_cache_stats = {k: v - http_cache_stats[k] for k, v in http_cache.get_stats().items()}
+            logging.info(f"{log_module}:{harvest_server.name} ({harvester.type.upper()}) HTTP cache hits: {harvester.http_cache_stats['hits']} | revalidated: {harvester.http_cache_stats['revalidated']} | unchanged: {harvester.http_cache_stats['unchanged']} | downloaded: {harvester.http_cache_stats['misses']}")
 
         # Output info
         end = datetime.now()
@@ -55,6 +66,9 @@ def launch_harvest(harvest_server=None, ckan_info=None):
         # Log CKAN Datasets with conflicts
         logging.info(log_module + ":" + harvest_server["name"] + " (" + harvester.type.upper() + ") dataset records retrieved (" + str(harvester.source_dataset_count) + ") with conflicts: (" + str(len(harvester.ckan_dataset_errors)) + ") from ('" + harvester.type.upper() + "')")
         
+        if ckan_info.upsert_mode:
+            logging.info(f"{log_module}:{harvest_server.name} ({harvester.type.upper()}) datasets created: {harvester.ckan_dataset_count} | updated: {harvester.ckan_dataset_updated_count} | unchanged: {harvester.ckan_dataset_unchanged_count}")
+
         if harvester.ckan_dataset_errors:
             logging.info(log_module + ":" + "Check Datasets with conflicts by 'title': " + json.dumps(harvester.ckan_dataset_errors, ensure_ascii=False))
         
@@ -69,6 +83,7 @@ def launch_harvest(harvest_server=None, ckan_info=None):
     
     except Exception as e:
         logging.exception("An exception occurred!")
+        harvester.harvest_status = 'failed'
 
         # Output info
         end = datetime.now()
@@ -79,6 +94,52 @@ def launch_harvest(harvest_server=None, ckan_info=None):
 
     return harvester
 
+def launch_harvest_summary(harvest_server=None, ckan_info=None):
+    """
+    Launch harvesting process and return only its results, used by the parallel workers
+
+    :param harvest_server: Harvest server parameters
+    :param ckan_info: CKAN Parameters from config.yaml
+
+    :return: Picklable summary of the harvester (counters and conflicts)
+    """
+    return launch_harvest(harvest_server=harvest_server, ckan_info=ckan_info).get_summary()
+
+def init_harvest_worker(log_filename):
+    """
+    Initialize a worker process of the parallel harvesting pool
+
+    :param log_filename: Log file of the main process
+    """
+    ssl._create_default_https_context = ssl._create_unverified_context
+    log_worker_file(log_filename)
+
+def get_failed_summary(harvest_server, error):
+    """
+    Summary of a harvest server that could not be launched
+
+    :param harvest_server: Harvest server parameters
+    :param error: Exception raised
+
+    :return: Summary with the same keys as Harvester.get_summary()
+    """
+    return {
+        'name': harvest_server.name,
+        'type': harvest_server.type,
+        'url': harvest_server.url,
+        'status': 'failed',
+        'source_dataset_count': 0,
+        'ckan_dataset_count': 0,
+        'ckan_dataset_updated_count': 0,
+        'ckan_dataset_unchanged_count': 0,
+        'ckan_dataset_errors': [{'title': harvest_server.name, 'error': str(error)}],
+        'source_dictionaries_count': 0,
+        'ckan_dictionaries_count': 0,
+        'ckan_dictionaries_errors': [],
+        'http_cache_stats': {},
+        'source_removed_records': [],
+    }
+
 def setup_logging(log_module, VERSION):
     ssl._create_default_https_context = ssl._create_unverified_context
     log_file(APP_DIR + "/log")
@@ -93,8 +154,8 @@ def validate_configuration(config_file):
 
 def start_harvesting(config_file):
     ckan_info, harvest_servers, db_dsn = config_getParameters(config_file)
-    processes = os.cpu_count() - 1
-    new_records = []
+    processes = ckan_info.parallelization_workers or max(os.cpu_count() - 1, 1)
+    harvest_summaries = []
 
     if ckan_info.ckan_harvester is not None:
         active_harvesters = [h["type"] for h in ckan_info.ckan_harvester.values() if h['active'] is True]
@@ -117,38 +178,73 @@ def start_harvesting(config_file):
         logging.info(f"{log_module}:CKAN_URL: {ckan_info.ckan_site_url}")
 
         try:
-            if harvest_servers is not None and ckan_info.parallelization is True:
-                #TODO: Fix multicore parallel processing
-                logging.warning(f'{log_module}:Parallel processing is not implemented yet.')
-                '''
-                parallel_count = Parallel(n_jobs=processes)(delayed(launch_harvest)(harvest_server=endpoint, ckan_info=ckan_info) for endpoint in harvest_servers)
-                new_records.append(sum(i[0] for i in parallel_count))
-                '''
+            if harvest_servers and ckan_info.parallelization is True:
+                processes = min(processes, len(harvest_servers))
+                logging.info(f"{log_module}:Parallel harvesting of {len(harvest_servers)} servers with {processes} worker processes")
+                with ProcessPoolExecutor(max_workers=processes, initializer=init_harvest_worker, initargs=(get_log_filename(),)) as executor:
+                    futures = [executor.submit(launch_harvest_summary, harvest_server=endpoint, ckan_info=ckan_info) for endpoint in harvest_servers]
+                    # Keep the order of 'harvest_servers' in the summary
+                    for endpoint, future in zip(harvest_servers, futures):
+                        try:
+                            harvest_summaries.append(future.result())
+                        except Exception as e:
+                            logging.error(f"{log_module}:{endpoint.name} ({endpoint.type.upper()}) harvest worker failed. Error: {e}")
+                            harvest_summaries.append(get_failed_summary(endpoint, e))
             elif harvest_servers and ckan_info.parallelization is False:
                 for endpoint in harvest_servers:
                     harvester = launch_harvest(harvest_server=endpoint, ckan_info=ckan_info)
-                    new_records.append(harvester.ckan_dataset_count)
+                    harvest_summaries.append(harvester.get_summary())
         except Exception as e:
             logging.error(f"{log_module}:Check invalid 'type' and 'active: True' in 'harvest_servers/{{my-harvest-server}}'at {config_file} Error: {e}")
-            new_records = 0
 
-    return new_records, harvest_servers
+    return harvest_summaries, harvest_servers
+
+def log_harvest_summary(harvest_summaries):
+    """
+    Log the aggregated results of all the harvest servers
+
+    :param harvest_summaries: List of Harvester.get_summary() dicts
+
+    :return: Total of new CKAN Datasets
+    """
+    new_records = sum(s['ckan_dataset_count'] for s in harvest_summaries)
+    source_records = sum(s['source_dataset_count'] for s in harvest_summaries)
+    dataset_conflicts = sum(len(s['ckan_dataset_errors']) for s in harvest_summaries)
+    dictionaries_conflicts = sum(len(s['ckan_dictionaries_errors']) for s in harvest_summaries)
+    failed_servers = [s['name'] for s in harvest_summaries if s['status'] == 'failed']
+    unchanged_servers = [s['name'] for s in harvest_summaries if s['status'] == 'unchanged']
+
+    logging.info(f"{log_module}:Dataset records retrieved: {source_records} with conflicts: {dataset_conflicts} | Data dictionaries conflicts: {dictionaries_conflicts}")
+    if any(s['ckan_dataset_updated_count'] or s['ckan_dataset_unchanged_count'] for s in harvest_summaries):
+        logging.info(f"{log_module}:Datasets updated: {sum(s['ckan_dataset_updated_count'] for s in harvest_summaries)} | unchanged: {sum(s['ckan_dataset_unchanged_count'] for s in harvest_summaries)}")
+    if any(s['http_cache_stats'] for s in harvest_summaries):
+        http_cache_stats = {k: sum(s['http_cache_stats'].get(k, 0) for s in harvest_summaries) for k in ['hits', 'revalidated', 'unchanged', 'misses']}
+        logging.info(f"{log_module}:HTTP cache hits: {http_cache_stats['hits']} | revalidated: {http_cache_stats['revalidated']} | unchanged: {http_cache_stats['unchanged']} | downloaded: {http_cache_stats['misses']}")
+    for s in harvest_summaries:
+        if s['source_removed_records']:
+            logging.warning(f"{log_module}:{s['name']} ({s['type'].upper()}) records removed from the source since the last harvest: {len(s['source_removed_records'])}")
+    if unchanged_servers:
+        logging.info(f"{log_module}:Harvest servers unchanged since the last harvest: {', '.join(unchanged_servers)}")
+    if failed_servers:
+        logging.error(f"{log_module}:Harvest servers failed: {', '.join(failed_servers)}")
+
+    return new_records
 
 def main():
     harvester_start = setup_logging(log_module, VERSION)
     
     try:
         validate_configuration(config_file)
-        new_records, harvest_servers = start_harvesting(config_file)
+        harvest_summaries, harvest_servers = start_harvesting(config_file)
+        new_records = log_harvest_summary(harvest_summaries)
+
+        http_cache = get_http_cache()
+        if http_cache is not None:
+            http_cache.evict()
 
         harvester_end = datetime.now()
         hrvst_diff = harvester_end - harvester_start
 
-        if isinstance(new_records, list):
-            new_records = sum(new_records)
-        else:
-            new_records = 0
-
         logging.info(f"{log_module}:'config.yaml' sources: {str(len(harvest_servers))} and new CKAN Datasets: {str(new_records)} | Total time elapsed: {str(hrvst_diff).split('.')[0]}" )
 
     except Exception as e: